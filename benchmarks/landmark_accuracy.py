@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# src.config 는 import 시점에 필수 환경변수를 요구하므로 하네스 단독 실행용 기본값을 채워 둔다.
+for _key in ("SECRET_KEY", "JWT_ALGORITHM", "JWT_USER_ID_CLAIM", "JWT_JTI_CLAIM",
+             "JWT_AUDIENCE", "JWT_ISSUER", "DATABASE_URL"):
+    os.environ.setdefault(_key, "benchmark")
+
+from src.services.core import CoreService  # noqa: E402
+from src.services.engine import LandmarkEngine  # noqa: E402
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+REFERENCE = ("face_pose", 1)
+CANDIDATES = [
+    ("pose", 0),
+    ("pose", 1),
+    ("pose", 2),
+    ("face_pose", 0),
+    ("face_pose", 1),
+    ("face_pose", 2),
+]
+
+
+def load_images(path: Path) -> List[tuple[str, bytes]]:
+    files = [path] if path.is_file() else sorted(
+        p for p in path.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    return [(str(p), p.read_bytes()) for p in files]
+
+
+def run_backend(backend: str, complexity: int, images: List[tuple[str, bytes]]) -> Dict[str, Any]:
+    # 샘플 이미지는 서로 독립적이므로 트래킹 없이 static_image_mode 로 돌린다.
+    results: Dict[str, Dict[str, Any]] = {}
+    timings: List[float] = []
+    with LandmarkEngine(backend, complexity, static_image_mode=True) as engine:
+        for name, data in images:
+            started = time.perf_counter()
+            results[name] = CoreService.process_image_bytes(
+                data, engine, "metrics")
+            timings.append(time.perf_counter() - started)
+    return {"results": results, "timings": timings}
+
+
+def _abs_errors(ref: Dict[str, Dict[str, Any]], got: Dict[str, Dict[str, Any]], key: str) -> List[float]:
+    errors = []
+    for name, r in ref.items():
+        a, b = r.get(key), got.get(name, {}).get(key)
+        if a is not None and b is not None:
+            errors.append(abs(float(a) - float(b)))
+    return errors
+
+
+def _summary(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=np.float64)
+    return {
+        "mean": round(float(arr.mean()), 4),
+        "p95": round(float(np.percentile(arr, 95)), 4),
+        "max": round(float(arr.max()), 4),
+    }
+
+
+def compare(images: List[tuple[str, bytes]], candidates=CANDIDATES) -> Dict[str, Any]:
+    reference = run_backend(*REFERENCE, images)
+    ref_results = reference["results"]
+    ref_detected = sum(1 for r in ref_results.values() if r["has_angle"])
+
+    report: Dict[str, Any] = {
+        "images": len(images),
+        "reference": {
+            "backend": REFERENCE[0],
+            "pose_complexity": REFERENCE[1],
+            "detected": ref_detected,
+            "ms_per_frame": _summary([t * 1000 for t in reference["timings"]]),
+        },
+        "candidates": [],
+    }
+
+    for backend, complexity in candidates:
+        run = run_backend(backend, complexity, images)
+        got = run["results"]
+        detected = sum(1 for r in got.values() if r["has_angle"])
+        both = sum(1 for name, r in ref_results.items()
+                   if r["has_angle"] and got[name]["has_angle"])
+        report["candidates"].append({
+            "backend": backend,
+            "pose_complexity": complexity,
+            "detected": detected,
+            "agreement": round(both / ref_detected, 4) if ref_detected else None,
+            "angle_abs_err_deg": _summary(_abs_errors(ref_results, got, "neck_angle_deg")),
+            "shoulder_y_diff_abs_err_px": _summary(_abs_errors(ref_results, got, "shoulder_y_diff_px")),
+            "shoulder_y_avg_abs_err_px": _summary(_abs_errors(ref_results, got, "shoulder_y_avg_px")),
+            "ms_per_frame": _summary([t * 1000 for t in run["timings"]]),
+        })
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="랜드마크 백엔드별 각도 정확도/속도를 기준(face_pose, complexity=1)과 비교한다.")
+    parser.add_argument("images", type=Path, help="샘플 이미지 파일 또는 디렉터리")
+    parser.add_argument("--max-angle-err", type=float, default=None,
+                        help="지정하면 평균 각도 오차가 이 값 이하인 가장 빠른 후보를 추천한다.")
+    parser.add_argument("--out", type=Path, default=None, help="JSON 리포트 저장 경로")
+    args = parser.parse_args(argv)
+
+    images = load_images(args.images)
+    if not images:
+        print(f"이미지를 찾을 수 없습니다: {args.images}", file=sys.stderr)
+        return 1
+
+    report = compare(images)
+
+    if args.max_angle_err is not None:
+        ok = [c for c in report["candidates"]
+              if c["angle_abs_err_deg"] and c["angle_abs_err_deg"]["mean"] <= args.max_angle_err]
+        best = min(ok, key=lambda c: c["ms_per_frame"]["mean"], default=None)
+        report["recommended"] = (
+            {"backend": best["backend"], "pose_complexity": best["pose_complexity"]} if best else None)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
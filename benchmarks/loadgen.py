@@ -0,0 +1,776 @@
+import os
+import sys
+import glob
+import gzip
+import json
+import time
+import uuid
+import struct
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import numpy as np
+
+# src.config 는 import 시점에 필수 환경변수를 요구하므로 하네스 단독 실행용 기본값을 채워 둔다.
+# 재생 클라이언트가 서명한 토큰을 띄운 서버가 그대로 검증하도록 두 프로세스가 같은 값을 쓴다.
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_USER_ID_CLAIM", "sub")
+os.environ.setdefault("JWT_JTI_CLAIM", "jti")
+for _key in ("SECRET_KEY", "JWT_AUDIENCE", "JWT_ISSUER", "DATABASE_URL"):
+    os.environ.setdefault(_key, "benchmark")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS_DIR = os.path.join(ROOT, "src", "workers")
+
+# 녹화:  python -m benchmarks.loadgen record --upstream ws://127.0.0.1:8000 --out prod.rec
+#        (클라이언트를 ws://127.0.0.1:8765 로 붙이면 업스트림으로 중계하며 클라이언트 -> 서버 메시지를 기록한다)
+# 합성:  python -m benchmarks.loadgen synth --app textneck --seconds 30 --fps 15 --images samples/ --out synth.rec
+#        (--images 가 없으면 그린 실루엣을 쓰는데, MediaPipe 가 사람을 찾지 못해 DB 쓰기는 재지 못한다)
+# 재생:  python -m benchmarks.loadgen replay synth.rec --spawn textneck --sessions 50 --speed 2
+#        --spawn 이 있으면 서버를 직접 띄우고(textneck 은 Mongo 대신 프로세스 내 스탠드인) CPU/메모리와 DB 쓰기를 잰다.
+#        --url 로 이미 떠 있는 서버를 겨냥할 수도 있다 (이때 서버 측 수치는 --pid 를 줄 때만 잰다).
+
+REC_MAGIC = b"TNREC1\n"
+# (세션 번호, 세션 시작 기준 초, 종류, 페이로드 길이)
+REC_HEADER = struct.Struct("!IdBI")
+KIND_OPEN, KIND_TEXT, KIND_BYTES, KIND_CLOSE = 0, 1, 2, 3
+
+APPS = ("textneck", "face")
+DEFAULT_PATHS = {"textneck": "/core/v1/ws/textneck/", "face": "/ws/face"}
+
+
+class RecordedSession:
+    def __init__(self, path: str, source: Optional[str] = None):
+        self.path = path
+        # 프레임 출처. 녹화는 None, synth 는 "images" 또는 "synthetic"
+        self.source = source
+        # (세션 시작 기준 초, 메시지). 텍스트는 str, 프레임은 bytes
+        self.messages: List[Tuple[float, str | bytes]] = []
+
+    @property
+    def frames(self) -> int:
+        return sum(1 for _, m in self.messages if isinstance(m, bytes))
+
+    @property
+    def duration(self) -> float:
+        return self.messages[-1][0] if self.messages else 0.0
+
+
+class RecordWriter:
+    # gzip 으로 감싼 길이 접두 레코드 스트림. 여러 세션이 섞여 기록된다.
+    def __init__(self, path: Path):
+        self._f = gzip.open(path, "wb", compresslevel=6)
+        self._f.write(REC_MAGIC)
+        self._sessions = 0
+
+    def open_session(self, path: str, source: Optional[str] = None) -> int:
+        sid = self._sessions
+        self._sessions += 1
+        meta = {"path": path} if source is None else {"path": path, "source": source}
+        self._write(sid, 0.0, KIND_OPEN, json.dumps(meta).encode())
+        return sid
+
+    def message(self, sid: int, t: float, message: str | bytes):
+        if isinstance(message, bytes):
+            self._write(sid, t, KIND_BYTES, message)
+        else:
+            self._write(sid, t, KIND_TEXT, message.encode("utf-8"))
+
+    def close_session(self, sid: int, t: float):
+        self._write(sid, t, KIND_CLOSE, b"")
+
+    def _write(self, sid: int, t: float, kind: int, payload: bytes):
+        self._f.write(REC_HEADER.pack(sid, t, kind, len(payload)))
+        self._f.write(payload)
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def read_recording(path: Path) -> List[RecordedSession]:
+    sessions: Dict[int, RecordedSession] = {}
+    with gzip.open(path, "rb") as f:
+        if f.read(len(REC_MAGIC)) != REC_MAGIC:
+            raise ValueError(f"녹화 파일 형식이 아닙니다: {path}")
+        try:
+            while len(header := f.read(REC_HEADER.size)) == REC_HEADER.size:
+                sid, t, kind, length = REC_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    break
+                if kind == KIND_OPEN:
+                    meta = json.loads(payload)
+                    sessions[sid] = RecordedSession(meta["path"], meta.get("source"))
+                elif kind == KIND_TEXT:
+                    sessions[sid].messages.append((t, payload.decode("utf-8")))
+                elif kind == KIND_BYTES:
+                    sessions[sid].messages.append((t, payload))
+        except EOFError:
+            # 녹화 중이거나 강제 종료된 파일은 gzip 끝 표시가 없다. 온전한 레코드까지만 읽는다.
+            pass
+    return [s for _, s in sorted(sessions.items()) if s.messages]
+
+
+def _strip_token(path: str) -> str:
+    # 녹화 파일에 실제 사용자 토큰을 남기지 않는다. 재생할 때 새로 서명한다.
+    parts = urlsplit(path)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != "token"]
+    return parts.path + (f"?{urlencode(query)}" if query else "")
+
+
+async def record(listen: str, upstream: str, out: Path):
+    from websockets.asyncio.client import connect
+    from websockets.asyncio.server import serve
+    from websockets.exceptions import ConnectionClosed
+
+    writer = RecordWriter(out)
+    host, port = listen.rsplit(":", 1)
+
+    async def handler(client):
+        path = client.request.path
+        sid = writer.open_session(_strip_token(path))
+        started = time.monotonic()
+        print(f"세션 {sid} 녹화 시작: {_strip_token(path)}", file=sys.stderr)
+        async with connect(upstream.rstrip("/") + path, max_size=None) as server:
+            async def client_to_server():
+                async for message in client:
+                    writer.message(sid, time.monotonic() - started, message)
+                    await server.send(message)
+
+            async def server_to_client():
+                async for message in server:
+                    await client.send(message)
+
+            tasks = [asyncio.create_task(client_to_server()), asyncio.create_task(server_to_client())]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            except ConnectionClosed:
+                pass
+            finally:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        writer.close_session(sid, time.monotonic() - started)
+        print(f"세션 {sid} 녹화 종료", file=sys.stderr)
+
+    # SIGINT/SIGTERM 모두 gzip 끝 표시까지 쓰고 끝낸다 (백그라운드 실행 시에는 SIGINT 가 무시된 채 상속된다).
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+    try:
+        async with serve(handler, host, int(port), max_size=None):
+            print(f"{listen} 에서 대기, {upstream} 으로 중계합니다. Ctrl+C 로 종료.", file=sys.stderr)
+            await stop
+    finally:
+        writer.close()
+
+
+def synth(app: str, out: Path, sessions: int, seconds: float, fps: float,
+          width: int, height: int, quality: int, motion: float, images: Optional[Path] = None):
+    # 실제 녹화가 없을 때 쓰는 합성 세션. 머리를 조금씩 흔들어 프레임 게이트가 매번 걸리지 않게 한다.
+    # images 를 주면 그 사진들을 width x height 로 맞춰 세션마다 돌아가며 쓴다.
+    # 그린 실루엣은 MediaPipe 가 사람으로 보지 않아 각도와 DB 쓰기가 나오지 않는다.
+    import cv2
+    from benchmarks.landmark_accuracy import load_images
+    from benchmarks.pipeline import synthetic_frame
+
+    bases: List[np.ndarray] = []
+    if images is not None:
+        for _, data in load_images(images):
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if img is not None:
+                bases.append(cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA))
+        if not bases:
+            raise ValueError(f"읽을 수 있는 이미지가 없습니다: {images}")
+    source = "images" if bases else "synthetic"
+    bases = bases or [synthetic_frame(width, height)]
+
+    n = max(1, int(seconds * fps))
+    clips: List[List[bytes]] = []
+    for base in bases:
+        frames = []
+        for i in range(min(n, int(fps * 4) or 1)):
+            dx = int(round(np.sin(i / max(1.0, fps) * np.pi) * motion * width))
+            ok, buf = cv2.imencode(".jpg", np.roll(base, dx, axis=1), [cv2.IMWRITE_JPEG_QUALITY, quality])
+            assert ok
+            frames.append(buf.tobytes())
+        clips.append(frames)
+
+    writer = RecordWriter(out)
+    try:
+        for k in range(sessions):
+            frames = clips[k % len(clips)]
+            sid = writer.open_session(DEFAULT_PATHS[app], source)
+            if app == "textneck":
+                writer.message(sid, 0.0, json.dumps({"action": "init", "output": "metrics", "rate": True}))
+                writer.message(sid, 0.05, json.dumps({"action": "resume"}))
+                start = 0.1
+            else:
+                writer.message(sid, 0.0, json.dumps({"type": "config", "format": "f32", "rate": True}))
+                start = 0.05
+            for i in range(n):
+                writer.message(sid, start + i / fps, frames[i % len(frames)])
+            writer.close_session(sid, start + n / fps)
+    finally:
+        writer.close()
+
+
+def make_token(user_id: int, ttl: float = 3600.0) -> str:
+    from jose import jwt
+    from src.config import settings
+
+    now = int(time.time())
+    claims = {
+        settings.JWT_USER_ID_CLAIM: str(user_id),
+        settings.JWT_JTI_CLAIM: uuid.uuid4().hex,
+        "aud": settings.JWT_AUDIENCE,
+        "iss": settings.JWT_ISSUER,
+        "iat": now,
+        "exp": now + int(ttl),
+    }
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+
+# ---- 서버 쪽: Mongo 대신 프로세스 내 스탠드인을 끼운 textneck 앱 ----
+
+class MemoryDatabase:
+    # angle_log_buffer / known_users 가 쓰는 Database 메서드만 흉내 내고 쓰기 횟수를 센다.
+    def __init__(self, name: str, latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.ops = 0
+        self.documents = 0
+        self._users: set = set()
+
+    async def _roundtrip(self, documents: int):
+        self.ops += 1
+        self.documents += documents
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    async def insert_many(self, documents: List[Dict[str, Any]]):
+        from src.schemas.writes import WriteResult
+        if not documents:
+            return WriteResult(acknowledged=True)
+        await self._roundtrip(len(documents))
+        return WriteResult(acknowledged=True, inserted_count=len(documents))
+
+    async def bulk_write(self, ops: List[Any]):
+        from src.schemas.writes import WriteResult
+        if not ops:
+            return WriteResult(acknowledged=True)
+        await self._roundtrip(len(ops))
+        return WriteResult(acknowledged=True, modified_count=len(ops))
+
+    async def ensure_by_user_id(self, user_id: int, defaults: Optional[Dict[str, Any]] = None):
+        from src.schemas.writes import WriteResult
+        await self._roundtrip(1)
+        created = user_id not in self._users
+        self._users.add(user_id)
+        return WriteResult(acknowledged=True, matched_count=0 if created else 1, upserted_count=int(created))
+
+    def stats(self) -> Dict[str, int]:
+        return {"ops": self.ops, "documents": self.documents}
+
+
+def create_app():
+    # uvicorn --factory 진입점. 워커 프로세스마다 불리며, 종료 시 DB 쓰기 수를 LOADGEN_DB_STATS_DIR 에 남긴다.
+    import src.main
+    from src.auth.known_users import known_users
+    from src.database.buffer import angle_log_buffer
+
+    latency = float(os.environ.get("LOADGEN_DB_LATENCY_MS", "0")) / 1000
+    stand_ins = {
+        "angle_logs": MemoryDatabase("angle_logs", latency),
+        "angle_rollups": MemoryDatabase("angle_rollups", latency),
+        "users": MemoryDatabase("users", latency),
+    }
+    angle_log_buffer.repo = stand_ins["angle_logs"]
+    angle_log_buffer.rollup_repo = stand_ins["angle_rollups"]
+    known_users.repo = stand_ins["users"]
+
+    async def no_database():
+        pass
+
+    src.main.initialize_database = no_database
+    app = src.main.app
+    inner = app.router.lifespan_context
+    stats_dir = os.environ.get("LOADGEN_DB_STATS_DIR")
+
+    @asynccontextmanager
+    async def lifespan(a):
+        async with inner(a) as state:
+            yield state
+        # 버퍼의 마지막 flush 까지 끝난 뒤에 센다.
+        if stats_dir:
+            with open(os.path.join(stats_dir, f"db-{os.getpid()}.json"), "w") as f:
+                json.dump({name: db.stats() for name, db in stand_ins.items()}, f)
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def serve(host: str, port: int, workers: int):
+    import uvicorn
+    uvicorn.run("benchmarks.loadgen:create_app", factory=True, host=host, port=port,
+                workers=workers, log_level="warning", ws_max_size=64 << 20)
+
+
+# ---- 서버 프로세스 트리 CPU/메모리 샘플링 ----
+
+def _children(pid: int) -> List[int]:
+    out: List[int] = []
+    for path in glob.glob(f"/proc/{pid}/task/*/children"):
+        try:
+            with open(path) as f:
+                out.extend(int(c) for c in f.read().split())
+        except OSError:
+            pass
+    return out
+
+
+def _tree(pid: int) -> List[int]:
+    pids, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        pids.append(p)
+        stack.extend(_children(p))
+    return pids
+
+
+def _cpu_rss(pid: int) -> Tuple[float, int]:
+    # (utime + stime 초, RSS 바이트)
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return cpu, int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class ProcessSampler:
+    # 서버 프로세스와 자식(gunicorn/uvicorn 워커, 추론 프로세스 풀, 얼굴 워커)의 CPU 와 RSS 합을 주기적으로 잰다.
+    # 종료된 자식의 CPU 는 빠지므로 재생 중 교체되는 프로세스가 많으면 낮게 잡힌다.
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_processes = 0
+        self._cpu: Dict[int, float] = {}
+        self._cpu0: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started = 0.0
+
+    def sample(self):
+        rss = 0
+        pids = _tree(self.pid)
+        for p in pids:
+            try:
+                cpu, r = _cpu_rss(p)
+            except (OSError, IndexError, ValueError):
+                continue
+            self._cpu[p] = cpu
+            rss += r
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_processes = max(self.peak_processes, len(pids))
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.sample()
+        self._cpu0 = dict(self._cpu)
+        self._started = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict[str, Any]:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+        elapsed = time.monotonic() - self._started
+        cpu = sum(v - self._cpu0.get(p, 0.0) for p, v in self._cpu.items())
+        return {
+            "cpu_seconds": round(cpu, 3),
+            "cpu_cores_avg": round(cpu / elapsed, 3) if elapsed > 0 else None,
+            "peak_rss_mb": round(self.peak_rss / (1 << 20), 1),
+            "peak_processes": self.peak_processes,
+        }
+
+
+# ---- 재생 ----
+
+class SessionResult:
+    def __init__(self):
+        self.frames_sent = 0
+        self.results = 0
+        self.errors: Dict[str, int] = {}
+        self.skipped_for_rate = 0
+        self.latencies: List[float] = []
+        self.rates: List[int] = []
+        self.server_frames: Optional[Dict[str, int]] = None
+        self.max_lag = 0.0
+        self.failed: Optional[str] = None
+
+
+class LatencyTracker:
+    # 서버는 최신 프레임 하나만 처리하고 결과에 프레임 id 를 돌려주지 않는다.
+    # 직전 결과를 받은 시각(= 서버가 다음 프레임을 집어 드는 시각)에 가장 최신이었던 프레임이 처리됐다고 보고,
+    # 그런 프레임이 없으면(서버가 놀고 있었으면) 그 뒤 처음 보낸 프레임이 처리됐다고 본다.
+    def __init__(self):
+        self.pending: Deque[float] = deque()
+        self.last_result_at = 0.0
+
+    def sent(self, at: float):
+        self.pending.append(at)
+
+    def result(self, at: float) -> Optional[float]:
+        if not self.pending:
+            return None
+        chosen = None
+        while self.pending and self.pending[0] <= self.last_result_at:
+            chosen = self.pending.popleft()
+        if chosen is None:
+            chosen = self.pending.popleft()
+        self.last_result_at = at
+        return at - chosen
+
+
+def _classify(message: str | bytes) -> Tuple[str, Any]:
+    if isinstance(message, bytes):
+        return "result", None
+    try:
+        obj = json.loads(message)
+    except ValueError:
+        return "other", None
+    if not isinstance(obj, dict):
+        return "other", None
+    if obj.get("type") == "rate":
+        return "rate", obj.get("fps")
+    if obj.get("type") == "pong":
+        return "other", None
+    if "status" in obj:
+        return "control", obj
+    return "result", obj
+
+
+async def replay_session(
+    url: str,
+    session: RecordedSession,
+    token: Optional[str],
+    speed: float,
+    obey_rate: bool,
+    drain: float
+) -> SessionResult:
+    from websockets.asyncio.client import connect
+    from websockets.exceptions import ConnectionClosed
+
+    out = SessionResult()
+    tracker = LatencyTracker()
+    path = session.path + (("&" if "?" in session.path else "?") + urlencode({"token": token}) if token else "")
+    stats_reply: asyncio.Future = asyncio.get_running_loop().create_future()
+    min_interval = 0.0
+
+    async def receive(ws):
+        nonlocal min_interval
+        async for message in ws:
+            now = time.monotonic()
+            kind, value = _classify(message)
+            if kind == "result":
+                if isinstance(value, dict) and (value.get("ok") is False or value.get("error")):
+                    err = str(value.get("error", "error"))
+                    out.errors[err] = out.errors.get(err, 0) + 1
+                out.results += 1
+                latency = tracker.result(now)
+                if latency is not None:
+                    out.latencies.append(latency)
+            elif kind == "rate" and value:
+                out.rates.append(int(value))
+                min_interval = 1.0 / float(value)
+            elif kind == "control" and value.get("status") == "stats" and not stats_reply.done():
+                stats_reply.set_result(value.get("frames"))
+
+    try:
+        async with connect(url.rstrip("/") + path, max_size=None, open_timeout=30) as ws:
+            reader = asyncio.create_task(receive(ws))
+            started = time.monotonic()
+            last_frame = 0.0
+            try:
+                for t, message in session.messages:
+                    due = started + t / speed
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        out.max_lag = max(out.max_lag, -delay)
+                    if isinstance(message, bytes):
+                        now = time.monotonic()
+                        if obey_rate and now - last_frame < min_interval:
+                            out.skipped_for_rate += 1
+                            continue
+                        last_frame = now
+                        out.frames_sent += 1
+                        tracker.sent(now)
+                    await ws.send(message)
+                    if reader.done():
+                        break
+
+                # 마지막 프레임의 결과를 기다린 뒤 textneck 은 서버 측 프레임 통계를 받아온다.
+                await asyncio.sleep(drain)
+                if "textneck" in session.path and not reader.done():
+                    await ws.send(json.dumps({"action": "stats"}))
+                    try:
+                        out.server_frames = await asyncio.wait_for(asyncio.shield(stats_reply), timeout=5.0)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                reader.cancel()
+                await asyncio.gather(reader, return_exceptions=True)
+    except ConnectionClosed as e:
+        out.failed = f"closed: {e}"
+    except Exception as e:
+        out.failed = f"{type(e).__name__}: {e}"
+    return out
+
+
+def _ms(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ms = np.asarray(values, dtype=np.float64) * 1000
+    return {
+        "n": len(values),
+        "mean": round(float(ms.mean()), 2),
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+
+def _spawn_server(app: str, host: str, port: int, workers: int, db_latency_ms: float,
+                  stats_dir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["LOADGEN_DB_LATENCY_MS"] = str(db_latency_ms)
+    env["LOADGEN_DB_STATS_DIR"] = stats_dir
+    if app == "textneck":
+        cmd = [sys.executable, "-m", "benchmarks.loadgen", "serve", "--host", host, "--port", str(port),
+               "--workers", str(workers)]
+        cwd = ROOT
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", host, "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning"]
+        cwd = WORKERS_DIR
+    return subprocess.Popen(cmd, cwd=cwd, env=env, start_new_session=True)
+
+
+async def _wait_listening(host: str, port: int, proc: subprocess.Popen, timeout: float):
+    # uvicorn 은 lifespan 시작(모델 로드, 워커 풀 준비)이 끝난 뒤에 소켓을 연다.
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"서버가 시작 중 종료되었습니다 (exit={proc.returncode})")
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"{timeout:.0f}초 안에 서버가 {host}:{port} 에서 열리지 않았습니다.")
+
+
+def _read_db_stats(stats_dir: str) -> Optional[Dict[str, Dict[str, int]]]:
+    total: Dict[str, Dict[str, int]] = {}
+    for path in glob.glob(os.path.join(stats_dir, "db-*.json")):
+        with open(path) as f:
+            for name, counts in json.load(f).items():
+                agg = total.setdefault(name, {"ops": 0, "documents": 0})
+                for k, v in counts.items():
+                    agg[k] += v
+    return total or None
+
+
+async def replay(args: argparse.Namespace) -> Dict[str, Any]:
+    recorded = read_recording(args.recording)
+    if not recorded:
+        raise ValueError(f"재생할 세션이 없습니다: {args.recording}")
+    if args.path:
+        for s in recorded:
+            s.path = args.path
+
+    proc: Optional[subprocess.Popen] = None
+    stats_dir = tempfile.mkdtemp(prefix="loadgen-")
+    url = args.url
+    pid = args.pid
+    if args.spawn:
+        proc = _spawn_server(args.spawn, args.host, args.port, args.workers, args.db_latency_ms, stats_dir)
+        url = f"ws://{args.host}:{args.port}"
+        pid = proc.pid
+    try:
+        if proc is not None:
+            await _wait_listening(args.host, args.port, proc, args.startup_timeout)
+        sampler = ProcessSampler(pid) if pid else None
+        if sampler is not None:
+            sampler.start()
+        cpu0 = time.process_time()
+        started = time.monotonic()
+
+        async def one(i: int) -> SessionResult:
+            # 세션 시작을 ramp 초에 걸쳐 고르게 흩는다.
+            await asyncio.sleep(args.ramp * i / max(1, args.sessions))
+            session = recorded[i % len(recorded)]
+            token = make_token(args.user_base + i % max(1, args.users)) if "textneck" in session.path else None
+            return await replay_session(url, session, token, args.speed, args.obey_rate, args.drain)
+
+        results = await asyncio.gather(*(one(i) for i in range(args.sessions)))
+        elapsed = time.monotonic() - started
+        client_cpu = time.process_time() - cpu0
+        server = await sampler.stop() if sampler is not None else None
+    finally:
+        if proc is not None:
+            # SIGTERM 으로 lifespan 종료(버퍼 flush, DB 통계 기록)까지 마치게 한다.
+            os.killpg(proc.pid, signal.SIGTERM)
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+
+    sent = sum(r.frames_sent for r in results)
+    received = sum(r.results for r in results)
+    errors: Dict[str, int] = {}
+    server_frames: Dict[str, int] = {}
+    for r in results:
+        for k, v in r.errors.items():
+            errors[k] = errors.get(k, 0) + v
+        for k, v in (r.server_frames or {}).items():
+            server_frames[k] = server_frames.get(k, 0) + v
+    rates = [r.rates[-1] for r in results if r.rates]
+    failures = [r.failed for r in results if r.failed]
+    sources = sorted({s.source or "recorded" for s in recorded})
+    note = None
+    if "synthetic" in sources and any("textneck" in s.path for s in recorded):
+        note = "합성 실루엣 프레임은 MediaPipe 가 사람을 찾지 못해 각도/DB 쓰기가 0 입니다. DB 쓰기를 재려면 synth --images 나 실제 녹화를 쓰세요."
+
+    return {
+        "meta": {
+            "recording": str(args.recording),
+            "recorded_sessions": len(recorded),
+            "frame_sources": sources,
+            "sessions": args.sessions,
+            "speed": args.speed,
+            "obey_rate": args.obey_rate,
+            "url": url,
+            "spawn": args.spawn,
+            "workers": args.workers if args.spawn else None,
+            "db_latency_ms": args.db_latency_ms if args.spawn == "textneck" else None,
+            "elapsed_sec": round(elapsed, 2),
+            "note": note,
+        },
+        "client": {
+            "failed_sessions": len(failures),
+            "failures": failures[:10],
+            "frames_sent": sent,
+            "results": received,
+            "dropped": max(0, sent - received),
+            "drop_ratio": round(1 - received / sent, 4) if sent else None,
+            "skipped_for_rate": sum(r.skipped_for_rate for r in results),
+            "errors": errors,
+            "result_fps": round(received / elapsed, 2) if elapsed > 0 else None,
+            # 추정치: LatencyTracker 참고
+            "latency_ms": _ms([v for r in results for v in r.latencies]),
+            # 세션마다 서버가 마지막으로 알린 목표 fps
+            "final_rate_fps": {"min": min(rates), "p50": float(np.median(rates)), "max": max(rates)} if rates else None,
+            "max_send_lag_ms": round(max((r.max_lag for r in results), default=0.0) * 1000, 1),
+            "cpu_seconds": round(client_cpu, 3),
+        },
+        # textneck 세션이 돌려준 서버 측 프레임 통계의 합 (dropped_superseded / stale / throttled 등)
+        "server_frames": server_frames or None,
+        "server": server,
+        "db": _read_db_stats(stats_dir) if args.spawn == "textneck" else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="WebSocket 세션 녹화/재생 부하 발생기 (/ws/textneck/, /ws/face)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="업스트림으로 중계하며 클라이언트 메시지를 녹화한다.")
+    p.add_argument("--listen", default="127.0.0.1:8765")
+    p.add_argument("--upstream", required=True, help="예: ws://127.0.0.1:8000")
+    p.add_argument("--out", type=Path, required=True)
+
+    p = sub.add_parser("synth", help="합성 프레임으로 녹화 파일을 만든다.")
+    p.add_argument("--app", choices=APPS, default="textneck")
+    p.add_argument("--out", type=Path, required=True)
+    p.add_argument("--sessions", type=int, default=1)
+    p.add_argument("--seconds", type=float, default=30.0)
+    p.add_argument("--fps", type=float, default=15.0)
+    p.add_argument("--width", type=int, default=640)
+    p.add_argument("--height", type=int, default=480)
+    p.add_argument("--quality", type=int, default=80)
+    p.add_argument("--motion", type=float, default=0.02, help="프레임 간 가로 흔들림 (폭 대비 비율)")
+    p.add_argument("--images", type=Path, default=None,
+                   help="사람이 찍힌 이미지 파일/디렉터리. 없으면 합성 실루엣을 쓰며 DB 쓰기는 재지 못한다.")
+
+    p = sub.add_parser("serve", help="Mongo 스탠드인을 끼운 textneck 앱을 띄운다.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=1)
+
+    p = sub.add_parser("replay", help="녹화된 세션을 N 개 동시에 재생한다.")
+    p.add_argument("recording", type=Path)
+    p.add_argument("--sessions", type=int, default=10)
+    p.add_argument("--speed", type=float, default=1.0, help="재생 배속")
+    p.add_argument("--ramp", type=float, default=1.0, help="세션 시작을 흩어 놓는 시간(초)")
+    p.add_argument("--drain", type=float, default=1.0, help="마지막 프레임 뒤 결과를 기다리는 시간(초)")
+    p.add_argument("--obey-rate", action="store_true", help="서버가 알린 fps 를 지켜 넘치는 프레임을 보내지 않는다.")
+    p.add_argument("--path", default=None, help="녹화된 경로 대신 쓸 WebSocket 경로")
+    p.add_argument("--users", type=int, default=0, help="토큰 사용자 수 (기본: 세션마다 다른 사용자)")
+    p.add_argument("--user-base", type=int, default=-800000)
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument("--spawn", choices=APPS, help="서버를 직접 띄워 재생하고 끝나면 종료한다.")
+    target.add_argument("--url", help="이미 떠 있는 서버. 예: ws://127.0.0.1:8000")
+    p.add_argument("--pid", type=int, default=None, help="--url 서버의 PID. 주면 CPU/메모리를 잰다.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=18000)
+    p.add_argument("--workers", type=int, default=1, help="--spawn 서버의 uvicorn 워커 수")
+    p.add_argument("--db-latency-ms", type=float, default=0.0, help="스탠드인 DB 왕복 지연")
+    p.add_argument("--startup-timeout", type=float, default=120.0)
+    p.add_argument("--out", type=Path, default=None, help="JSON 리포트 저장 경로")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        asyncio.run(record(args.listen, args.upstream, args.out))
+        return 0
+    if args.command == "synth":
+        synth(args.app, args.out, args.sessions, args.seconds, args.fps,
+              args.width, args.height, args.quality, args.motion, args.images)
+        return 0
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers)
+        return 0
+
+    if args.users <= 0:
+        args.users = args.sessions
+    report = asyncio.run(replay(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+for _key in ("SECRET_KEY", "JWT_ALGORITHM", "JWT_USER_ID_CLAIM", "JWT_JTI_CLAIM",
+             "JWT_AUDIENCE", "JWT_ISSUER"):
+    os.environ.setdefault(_key, "benchmark")
+
+from src.database.connection import initialize_database  # noqa: E402
+from src.database.orm import Database  # noqa: E402
+from src.models.users import User  # noqa: E402
+from src.schemas.angles import Angle  # noqa: E402
+
+# 실제 MongoDB 가 필요하다: DATABASE_URL=mongodb://localhost:27017/bench python -m benchmarks.orm_push
+
+
+def _samples(n: int) -> List[Angle]:
+    return [Angle(angle=90.0 + i % 7, shoulder_y_diff=3.0, shoulder_y_avg=240.0) for i in range(n)]
+
+
+async def _legacy_push(repo: Database, user_id: int, items: List[Angle]):
+    # 변경 전 동작: $push 후 5000개 로그가 든 전체 문서를 다시 읽어 beanie 로 검증한다.
+    coll = repo.model.get_pymongo_collection()
+    await coll.update_one(
+        {"user_id": user_id},
+        {"$setOnInsert": {"user_id": user_id},
+         "$push": {"angles_logs": {"$each": repo.to_payload(items), "$slice": -5000}}},
+        upsert=True
+    )
+    return await repo.model.find_one(repo.model.user_id == user_id)
+
+
+async def _measure(name: str, fn: Callable[[], Awaitable[Any]], iterations: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    peaks: List[int] = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            started = time.perf_counter()
+            await fn()
+            latencies.append(time.perf_counter() - started)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    finally:
+        tracemalloc.stop()
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "name": name,
+        "iterations": iterations,
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 3),
+            "p50": round(float(np.percentile(ms, 50)), 3),
+            "p95": round(float(np.percentile(ms, 95)), 3),
+        },
+        "peak_alloc_kb": {
+            "mean": round(float(np.mean(peaks)) / 1024, 1),
+            "max": round(float(np.max(peaks)) / 1024, 1),
+        },
+    }
+
+
+async def run(user_id: int, seed_logs: int, batch: int, iterations: int) -> Dict[str, Any]:
+    await initialize_database()
+    repo = Database(User)
+    coll = User.get_pymongo_collection()
+    await coll.delete_one({"user_id": user_id})
+    await coll.insert_one({"user_id": user_id, "angles_logs": repo.to_payload(_samples(seed_logs))})
+
+    items = _samples(batch)
+    try:
+        report = [
+            await _measure("legacy_push_then_find_one",
+                           lambda: _legacy_push(repo, user_id, items), iterations),
+            await _measure("push_ack_only",
+                           lambda: repo.push_many_by_user_id(user_id, items), iterations),
+            await _measure("push_readback_projection",
+                           lambda: repo.push_many_by_user_id(
+                               user_id, items, readback={"_id": 0, "angles_logs": {"$slice": -10}}),
+                           iterations),
+        ]
+    finally:
+        await coll.delete_one({"user_id": user_id})
+    return {"seed_logs": seed_logs, "batch": batch, "results": report}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="각도 로그 push 후 전체 문서 재조회 유무에 따른 지연/할당량 비교")
+    parser.add_argument("--user-id", type=int, default=-900001)
+    parser.add_argument("--seed-logs", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.user_id, args.seed_logs, args.batch, args.iterations))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
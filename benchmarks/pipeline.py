@@ -0,0 +1,298 @@
+import os
+import sys
+import json
+import time
+import base64
+import platform
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# src.config 는 import 시점에 필수 환경변수를 요구하므로 하네스 단독 실행용 기본값을 채워 둔다.
+for _key in ("SECRET_KEY", "JWT_ALGORITHM", "JWT_USER_ID_CLAIM", "JWT_JTI_CLAIM",
+             "JWT_AUDIENCE", "JWT_ISSUER", "DATABASE_URL"):
+    os.environ.setdefault(_key, "benchmark")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS_DIR = os.path.join(ROOT, "src", "workers")
+
+from src.services.core import CoreService, _decode_flag, _jpeg_size  # noqa: E402
+from src.services.engine import LandmarkEngine  # noqa: E402
+from src.utils.gate import thumbnail  # noqa: E402
+from benchmarks.landmark_accuracy import load_images  # noqa: E402
+
+# python -m benchmarks.pipeline --iterations 100 --out before.json
+# CoreService 프레임 파이프라인의 단계별 시간과 얼굴 워커 process_one 을 해상도별로 재고 JSON 으로 남긴다.
+# 커밋 간 비교용이므로 같은 머신에서 같은 인자로 돌린 결과끼리만 비교한다.
+# --images 를 주지 않으면 합성 프레임을 쓴다. 합성 프레임에서는 얼굴/포즈가 검출되지 않을 수 있으므로
+# 검출 경로(랜드마크 그리기, 각도 계산)까지 재려면 사람이 나온 사진을 --images 로 넘긴다.
+
+RESOLUTIONS = ((320, 240), (640, 480), (1280, 720), (1920, 1080))
+STAGES = ("b64_decode", "gate_thumbnail", "imdecode", "flip", "cvt_color", "face_mesh", "pose",
+          "drawing", "imencode", "b64_encode")
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    # 배경 노이즈 위에 머리와 어깨 실루엣을 그린 BGR 프레임
+    rng = np.random.default_rng(seed)
+    img = cv2.GaussianBlur(rng.integers(40, 200, (height, width, 3), dtype=np.uint8), (0, 0), 5)
+    cx, cy, r = width // 2, int(height * 0.38), min(width, height) // 6
+    cv2.ellipse(img, (cx, int(height * 0.95)), (int(r * 2.6), int(r * 1.6)), 0, 180, 360, (90, 60, 40), -1)
+    cv2.rectangle(img, (cx - r // 3, cy + r // 2), (cx + r // 3, cy + int(r * 1.4)), (150, 170, 200), -1)
+    cv2.ellipse(img, (cx, cy), (int(r * 0.8), r), 0, 0, 360, (150, 175, 210), -1)
+    for dx in (-r // 3, r // 3):
+        cv2.circle(img, (cx + dx, cy - r // 6), max(2, r // 10), (40, 30, 30), -1)
+    cv2.ellipse(img, (cx, cy + r // 2), (r // 3, max(2, r // 10)), 0, 0, 180, (60, 60, 150), -1)
+    return img
+
+
+def fixtures(images: Optional[Path], resolutions, quality: int) -> List[Tuple[str, bytes]]:
+    # (라벨, JPEG 바이트). 원본 이미지는 각 해상도로 맞춰 다시 인코딩한다.
+    sources: List[Tuple[str, np.ndarray]] = []
+    if images is not None:
+        for name, data in load_images(images):
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if img is not None:
+                sources.append((Path(name).stem, img))
+    out: List[Tuple[str, bytes]] = []
+    for w, h in resolutions:
+        frames = [(name, cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)) for name, img in sources] \
+            or [("synthetic", synthetic_frame(w, h))]
+        for name, img in frames:
+            ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            assert ok
+            out.append((f"{name}@{w}x{h}", buf.tobytes()))
+    return out
+
+
+def _summary(seconds: List[float], cpu: Optional[float] = None) -> Dict[str, Any]:
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    out: Dict[str, Any] = {
+        "n": len(seconds),
+        "mean": round(float(ms.mean()), 4),
+        "p50": round(float(np.percentile(ms, 50)), 4),
+        "p95": round(float(np.percentile(ms, 95)), 4),
+        "p99": round(float(np.percentile(ms, 99)), 4),
+    }
+    if cpu is not None:
+        # MediaPipe/OpenCV 내부 스레드까지 포함한 프로세스 CPU 시간 기준
+        out["cpu_ms_per_frame"] = round(cpu / len(seconds) * 1000, 4)
+        out["fps_per_core"] = round(len(seconds) / cpu, 2) if cpu > 0 else None
+    return out
+
+
+def _timed(fn: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    cpu0 = time.process_time()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return _summary(latencies, time.process_time() - cpu0)
+
+
+def _peak_rss_mb() -> float:
+    # 리눅스 ru_maxrss 단위는 KB
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _points(size: Tuple[int, int], face_results, pose_results):
+    # CoreService.process_image_bytes 와 같은 방식으로 코/어깨 픽셀 좌표를 뽑는다 (크롭 없는 전체 프레임 기준).
+    h, w = size
+
+    def to_px(lm):
+        return (int(lm.x * w), int(lm.y * h))
+
+    pose_lm = CoreService.mp_pose.PoseLandmark
+    nose = left = right = None
+    if face_results is not None and face_results.multi_face_landmarks:
+        nose = to_px(face_results.multi_face_landmarks[0].landmark[1])
+    elif face_results is None and pose_results is not None and pose_results.pose_landmarks:
+        nose = to_px(pose_results.pose_landmarks.landmark[pose_lm.NOSE])
+    if pose_results is not None and pose_results.pose_landmarks:
+        left = to_px(pose_results.pose_landmarks.landmark[pose_lm.LEFT_SHOULDER])
+        right = to_px(pose_results.pose_landmarks.landmark[pose_lm.RIGHT_SHOULDER])
+    return nose, left, right
+
+
+def stage_timings(engine: LandmarkEngine, jpeg: bytes, iterations: int) -> Dict[str, Any]:
+    # 단계를 하나씩 떼어 같은 프레임으로 반복한다. ROI 추적 없이 전체 프레임 기준이다.
+    b64 = base64.b64encode(jpeg).decode("ascii")
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    detected = 0
+    engine.reset()
+
+    def lap(stage: str, started: float) -> float:
+        now = time.perf_counter()
+        samples[stage].append(now - started)
+        return now
+
+    for _ in range(iterations):
+        t = time.perf_counter()
+        data = base64.b64decode(b64)
+        t = lap("b64_decode", t)
+        thumbnail(data)
+        t = lap("gate_thumbnail", t)
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), _decode_flag(_jpeg_size(data)))
+        t = lap("imdecode", t)
+        img = cv2.flip(img, 1)
+        t = lap("flip", t)
+        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        t = lap("cvt_color", t)
+        face_results = engine.face_mesh.process(rgb) if engine.face_mesh is not None else None
+        t = lap("face_mesh", t)
+        pose_results = engine.pose.process(rgb) if engine.pose is not None else None
+        t = lap("pose", t)
+
+        h, w = rgb.shape[:2]
+        nose, left, right = _points((h, w), face_results, pose_results)
+        angle = CoreService._calculate_angle(left, nose, right) if nose and left and right else None
+        shoulder_y_diff = abs(left[1] - right[1]) if left and right else None
+        shoulder_y_avg = (left[1] + right[1]) / 2.0 if left and right else None
+        detected += angle is not None
+        t = time.perf_counter()
+        overlay = CoreService._render_overlay(
+            (h, w), (0, 0, w, h), face_results, angle, nose, left, right, shoulder_y_diff, shoulder_y_avg)
+        t = lap("drawing", t)
+        _, buf = cv2.imencode(".jpg", overlay)
+        t = lap("imencode", t)
+        base64.b64encode(buf.tobytes()).decode("utf-8")
+        lap("b64_encode", t)
+
+    stages = {stage: _summary(s) for stage, s in samples.items() if samples[stage]}
+    if engine.face_mesh is None:
+        stages.pop("face_mesh")
+    if engine.pose is None:
+        stages.pop("pose")
+    return {"detected_ratio": round(detected / iterations, 3), "stages": stages}
+
+
+def end_to_end(engine: LandmarkEngine, jpeg: bytes, iterations: int, gated: bool) -> Dict[str, Any]:
+    # process_image_frame 전체. gated=False 면 같은 프레임이 반복돼도 매번 추론한다.
+    b64 = base64.b64encode(jpeg).decode("ascii")
+    gate = engine.gate
+    engine.reset()
+    engine.gate = gate if gated else None
+    try:
+        return _timed(lambda: CoreService.process_image_frame(b64, engine, "overlay"), iterations)
+    finally:
+        engine.gate = gate
+
+
+def calculate_angle(iterations: int, batch: int = 1000) -> Dict[str, Any]:
+    # 호출 하나는 타이머 해상도보다 짧으므로 batch 번씩 묶어 재고 호출당 시간으로 나눈다.
+    rng = np.random.default_rng(0)
+    points = [tuple(map(tuple, rng.integers(0, 1280, (3, 2)).tolist())) for _ in range(batch)]
+    latencies: List[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        for a, b, c in points:
+            CoreService._calculate_angle(a, b, c)
+        latencies.append((time.perf_counter() - started) / batch)
+    # _summary 는 초를 ms 로 바꾸므로 ms 단위로 넘겨 us 로 받는다.
+    return {"batch": batch, "us_per_call": _summary([s * 1000 for s in latencies])}
+
+
+def worker_process_one(jpeg: bytes, iterations: int, gated: bool) -> Dict[str, Any]:
+    # 얼굴 워커의 요청 처리 함수를 파이프 없이 직접 부른다 (base64 입력, f32 출력).
+    import worker  # 모듈 import 시 FaceMesh 를 올린다.
+    worker.face_mesh.reset()
+    worker.meshes.clear()
+    worker.gates.clear()
+    req = {"id": "bench", "gray": False, "format": "f32",
+           "image_b64": base64.b64encode(jpeg).decode("ascii")}
+    if gated:
+        req["sid"] = "bench"
+    res = worker.process_one(req)
+    if not res.get("ok"):
+        return {"error": res.get("error")}
+    summary = _timed(lambda: worker.process_one(req), iterations)
+    summary["landmarks"] = res.get("n")
+    return summary
+
+
+def _meta(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    import mediapipe as mp
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "mediapipe": mp.__version__,
+        "cpus": os.cpu_count(),
+        "iterations": args.iterations,
+        "quality": args.quality,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    resolutions = [tuple(int(v) for v in r.lower().split("x")) for r in args.resolutions] \
+        if args.resolutions else RESOLUTIONS
+    frames = fixtures(args.images, resolutions, args.quality)
+    report: Dict[str, Any] = {"meta": _meta(args), "frames": []}
+
+    with LandmarkEngine(args.backend, args.complexity) as engine:
+        report["meta"]["backend"] = engine.backend
+        report["meta"]["pose_complexity"] = engine.pose_complexity
+        for label, jpeg in frames:
+            # 첫 프레임은 그래프 초기화가 섞이므로 재지 않는다.
+            for _ in range(args.warmup):
+                CoreService.process_image_bytes(jpeg, engine, "overlay")
+            entry: Dict[str, Any] = {"frame": label, "jpeg_bytes": len(jpeg)}
+            entry.update(stage_timings(engine, jpeg, args.iterations))
+            entry["process_image_frame"] = end_to_end(engine, jpeg, args.iterations, gated=False)
+            entry["process_image_frame_gated"] = end_to_end(engine, jpeg, args.iterations, gated=True)
+            entry["peak_rss_mb"] = _peak_rss_mb()
+            report["frames"].append(entry)
+    report["calculate_angle"] = calculate_angle(args.iterations)
+
+    if not args.skip_worker:
+        sys.path.insert(0, WORKERS_DIR)
+        report["worker_process_one"] = []
+        for label, jpeg in frames:
+            report["worker_process_one"].append({
+                "frame": label,
+                "ungated": worker_process_one(jpeg, args.iterations, gated=False),
+                "gated": worker_process_one(jpeg, args.iterations, gated=True),
+                "peak_rss_mb": _peak_rss_mb(),
+            })
+    report["peak_rss_mb"] = _peak_rss_mb()
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="CoreService 프레임 파이프라인 단계별 지연, 코어당 fps, 최대 RSS 를 JSON 으로 측정한다.")
+    parser.add_argument("--images", type=Path, default=None,
+                        help="사람이 나온 이미지 파일 또는 디렉터리. 없으면 합성 프레임을 쓴다.")
+    parser.add_argument("--resolutions", nargs="*", default=None,
+                        help="WxH 목록 (기본: 320x240 640x480 1280x720 1920x1080)")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--quality", type=int, default=90)
+    parser.add_argument("--backend", default=None, help="LANDMARK_BACKEND (기본: 설정값)")
+    parser.add_argument("--complexity", type=int, default=None, help="POSE_MODEL_COMPLEXITY (기본: 설정값)")
+    parser.add_argument("--skip-worker", action="store_true", help="얼굴 워커 process_one 측정을 건너뛴다.")
+    parser.add_argument("--out", type=Path, default=None, help="JSON 리포트 저장 경로")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+WORKERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "workers")
+sys.path.insert(0, WORKERS_DIR)
+
+from worker_manager import PopenWorker  # noqa: E402
+
+# python -m benchmarks.worker_transport --frames 300 --width 1280 --height 720
+# 같은 JPEG 프레임을 base64 JSON 경로와 공유 메모리 경로로 각각 보내 처리량과 프레임당 CPU 를 비교한다.
+
+
+def _frame(width: int, height: int, quality: int) -> bytes:
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    cv2.circle(img, (width // 2, height // 2), min(width, height) // 4, (180, 160, 140), -1)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+    return buf.tobytes()
+
+
+def _proc_cpu(pid: int) -> float:
+    # /proc/<pid>/stat 의 utime + stime (초)
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def _run(name: str, frame: bytes, frames: int, warmup: int, shm_slots: int) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.setdefault("OMP_NUM_THREADS", "1")
+    worker = await PopenWorker.spawn([sys.executable, os.path.join(WORKERS_DIR, "worker.py")], env=env,
+                                     shm_slots=shm_slots, shm_slot_size=max(len(frame), 1 << 16))
+    try:
+        for _ in range(warmup):
+            await worker.ask(frame, False, timeout=30.0)
+
+        latencies: List[float] = []
+        errors = 0
+        gw_cpu0, wk_cpu0 = time.process_time(), _proc_cpu(worker.proc.pid)
+        started = time.perf_counter()
+        for _ in range(frames):
+            t0 = time.perf_counter()
+            res = await worker.ask(frame, False, timeout=5.0)
+            latencies.append(time.perf_counter() - t0)
+            errors += 0 if res.get("ok") else 1
+        elapsed = time.perf_counter() - started
+        gw_cpu = time.process_time() - gw_cpu0
+        wk_cpu = _proc_cpu(worker.proc.pid) - wk_cpu0
+    finally:
+        await worker.stop()
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "transport": name,
+        "frames": frames,
+        "errors": errors,
+        "fps": round(frames / elapsed, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(ms, 50)), 3),
+            "p95": round(float(np.percentile(ms, 95)), 3),
+        },
+        "cpu_ms_per_frame": {
+            "gateway": round(gw_cpu / frames * 1000, 3),
+            "worker": round(wk_cpu / frames * 1000, 3),
+        },
+    }
+
+
+async def run(frames: int, warmup: int, width: int, height: int, quality: int) -> Dict[str, Any]:
+    frame = _frame(width, height, quality)
+    return {
+        "frame_bytes": len(frame),
+        "resolution": [width, height],
+        "results": [
+            await _run("json_base64", frame, frames, warmup, shm_slots=0),
+            await _run("shared_memory", frame, frames, warmup, shm_slots=4),
+        ],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="워커 프레임 전송 방식(base64 JSON / 공유 메모리)별 처리량과 CPU 비교")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--quality", type=int, default=90)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.frames, args.warmup, args.width, args.height, args.quality))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
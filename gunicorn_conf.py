@@ -1,4 +1,8 @@
-workers = 4
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+# 앱이 추론 프로세스 수를 CPU 수 / 웹 워커 수로 잡도록 워커 수를 넘겨 준다.
+raw_env = [f"WEB_CONCURRENCY={workers}"]
 
 bind = "0.0.0.0:8000"
 
@@ -0,0 +1,76 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict
+
+from prometheus_client import Counter, Gauge
+
+from ..config import settings
+from ..database.orm import Database
+from ..models.users import User
+
+logger = logging.getLogger('prod')
+
+LOOKUPS = Counter(
+    "known_user_cache_lookups_total", "존재 확인된 사용자 캐시 조회 결과", ["result"])
+CACHE_SIZE = Gauge("known_user_cache_entries", "존재가 확인된 사용자 수")
+CREATED = Counter("known_user_created_total", "첫 요청에서 새로 만든 사용자 수")
+
+
+class KnownUserCache:
+    def __init__(self, repo: Database, max_entries: int = 100000, ttl: float = 600.0):
+        self.repo = repo
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # user_id -> 캐시 만료 시각(monotonic)
+        self._known: OrderedDict[int, float] = OrderedDict()
+        # 같은 신규 사용자의 동시 첫 요청은 하나의 upsert 를 함께 기다린다.
+        self._inflight: Dict[int, asyncio.Task] = {}
+
+    async def ensure(self, user_id: int) -> bool:
+        # 사용자가 존재함을 보장한다. 이번 호출로 새로 만들었으면 True.
+        now = time.monotonic()
+        expires_at = self._known.get(user_id)
+        if expires_at is not None:
+            if now < expires_at:
+                self._known.move_to_end(user_id)
+                LOOKUPS.labels("hit").inc()
+                return False
+            del self._known[user_id]
+
+        task = self._inflight.get(user_id)
+        if task is None:
+            LOOKUPS.labels("miss").inc()
+            task = asyncio.create_task(self._upsert(user_id))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        else:
+            LOOKUPS.labels("coalesced").inc()
+        # 먼저 온 요청이 취소돼도 upsert 는 끝까지 진행돼 나머지 요청에 결과를 준다.
+        return await asyncio.shield(task)
+
+    async def _upsert(self, user_id: int) -> bool:
+        result = await self.repo.ensure_by_user_id(user_id, {"angles_logs": []})
+        created = result.upserted_count > 0
+        if created:
+            CREATED.inc()
+            logger.info(f"새 사용자 ({user_id}) 생성 성공!")
+        self._remember(user_id)
+        return created
+
+    def _remember(self, user_id: int):
+        if self.max_entries <= 0:
+            return
+        self._known[user_id] = time.monotonic() + self.ttl
+        self._known.move_to_end(user_id)
+        while len(self._known) > self.max_entries:
+            self._known.popitem(last=False)
+        CACHE_SIZE.set(len(self._known))
+
+
+known_users = KnownUserCache(
+    Database(User),
+    max_entries=settings.KNOWN_USER_CACHE_MAX_ENTRIES,
+    ttl=settings.KNOWN_USER_CACHE_TTL_SEC,
+)
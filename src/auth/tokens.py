@@ -0,0 +1,94 @@
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError
+from prometheus_client import Counter, Gauge
+
+from ..config import settings
+
+CACHE_LOOKUPS = Counter(
+    "token_cache_lookups_total", "검증된 토큰 캐시 조회 결과", ["result"])
+CACHE_SIZE = Gauge("token_cache_entries", "캐시에 들어있는 검증된 토큰 수")
+
+
+class TokenVerifier:
+    def __init__(
+        self,
+        secret_key: str,
+        algorithms: List[str],
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None,
+        user_id_claim: str = "sub",
+        max_entries: int = 10000,
+        max_ttl: float = 300.0
+    ):
+        # decode 인자는 요청마다 만들지 않고 한 번만 만든다.
+        self.decode_kwargs: Dict[str, Any] = {
+            "key": secret_key,
+            "algorithms": algorithms,
+        }
+        if audience:
+            self.decode_kwargs["audience"] = audience
+        if issuer:
+            self.decode_kwargs["issuer"] = issuer
+        self.user_id_claim = user_id_claim
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        # sha256(token) -> (만료 시각(epoch), 검증된 클레임)
+        self._cache: OrderedDict[bytes, Tuple[float, Dict[str, Any]]] = OrderedDict()
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        # 서명/클레임 검증에 성공한 토큰만 캐시한다. 실패한 토큰은 매번 다시 검증한다.
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        now = time.time()
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires_at, claims = entry
+            if now < expires_at:
+                self._cache.move_to_end(key)
+                CACHE_LOOKUPS.labels("hit").inc()
+                return claims
+            del self._cache[key]
+            CACHE_SIZE.set(len(self._cache))
+            if "exp" in claims and now >= claims["exp"]:
+                CACHE_LOOKUPS.labels("expired").inc()
+                raise ExpiredSignatureError("Signature has expired.")
+
+        CACHE_LOOKUPS.labels("miss").inc()
+        claims = jwt.decode(token, **self.decode_kwargs)
+        self._store(key, claims, now)
+        return claims
+
+    def user_id(self, claims: Dict[str, Any]) -> int:
+        raw_user_id = claims.get(self.user_id_claim)
+        if raw_user_id is None:
+            raise ValueError(f"{self.user_id_claim} 클레임이 없습니다.")
+        return int(raw_user_id)
+
+    def _store(self, key: bytes, claims: Dict[str, Any], now: float):
+        # exp 가 없는 토큰도 max_ttl 이 지나면 다시 검증한다.
+        expires_at = now + self.max_ttl
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now or self.max_entries <= 0:
+            return
+        self._cache[key] = (expires_at, claims)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        CACHE_SIZE.set(len(self._cache))
+
+
+token_verifier = TokenVerifier(
+    settings.SECRET_KEY,
+    [settings.JWT_ALGORITHM],
+    audience=settings.JWT_AUDIENCE,
+    issuer=settings.JWT_ISSUER,
+    user_id_claim=settings.JWT_USER_ID_CLAIM,
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    max_ttl=settings.TOKEN_CACHE_MAX_TTL_SEC,
+)
@@ -10,6 +10,54 @@ class Settings(BaseSettings):
     JWT_ISSUER: str
     DATABASE_URL: str
 
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    TOKEN_CACHE_MAX_TTL_SEC: float = 300.0
+    KNOWN_USER_CACHE_MAX_ENTRIES: int = 100000
+    KNOWN_USER_CACHE_TTL_SEC: float = 600.0
+
+    ENGINE_POOL_MAX_SESSIONS: int = 64
+    ENGINE_POOL_MAX_IDLE: int = 4
+    ENGINE_IDLE_TTL_SEC: float = 300.0
+    LANDMARK_BACKEND: str = "face_pose"
+    POSE_MODEL_COMPLEXITY: int = 1
+
+    INGEST_MAX_SIDE: int = 640
+    INGEST_ROI: bool = True
+    INGEST_ROI_MARGIN: float = 0.75
+
+    INFERENCE_EXECUTOR: str = "process"
+    # 0 이면 CPU 수 / WEB_CONCURRENCY. 웹 워커마다 추론 프로세스를 따로 띄우므로 나눠 갖는다.
+    INFERENCE_WORKERS: int = 0
+    # 같은 호스트에 뜨는 웹 워커(gunicorn workers) 수. gunicorn_conf.py 가 채워 준다.
+    WEB_CONCURRENCY: int = 1
+    INFERENCE_DEADLINE_SEC: float = 1.0
+    INFERENCE_WARM_ENGINES: int = 1
+
+    FRAME_MAX_AGE_SEC: float = 0.5
+
+    GATE_ENABLED: bool = True
+    GATE_DIFF_THRESHOLD: float = 0.02
+    GATE_MAX_REUSE_SEC: float = 1.0
+    GATE_ABSENT_FRAMES: int = 15
+    GATE_PROBE_INTERVAL_SEC: float = 1.0
+
+    FLOW_ENABLED: bool = True
+    FLOW_MIN_FPS: float = 1.0
+    FLOW_MAX_FPS: float = 30.0
+    FLOW_TARGET_LATENCY_SEC: float = 0.2
+    FLOW_UPDATE_INTERVAL_SEC: float = 1.0
+    FLOW_GRACE_SEC: float = 2.0
+
+    ANGLE_BUFFER_MAX_BATCH: int = 1000
+    ANGLE_BUFFER_FLUSH_INTERVAL_SEC: float = 1.0
+    ANGLE_BUFFER_MAX_PENDING: int = 50000
+    ANGLE_BUFFER_ADD_TIMEOUT_SEC: float = 1.0
+
+    DASHBOARD_RECENT_LOGS: int = 5000
+    DASHBOARD_MAX_ROLLUP_BUCKETS: int = 1500
+    DASHBOARD_HISTORY_MAX_LIMIT: int = 10000
+    ROLLUP_DEFAULT_ANGLE_THRESHOLD: float = 0.0
+
     model_config = SettingsConfigDict(
         env_file=None,
         extra='ignore'
@@ -0,0 +1,58 @@
+import json
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+COMMANDS = {"init", "pause", "resume", "stats", "stop"}
+
+# 이보다 긴 텍스트 메시지는 제어 명령으로 보지 않고 곧바로 base64 프레임으로 취급한다.
+CONTROL_MAX_LEN = 4096
+INIT_THRESHOLD_KEYS = (
+    "angle_threshold",
+    "shoulder_y_diff_threshold",
+    "shoulder_y_avg_threshold",
+)
+
+# 바이너리 결과 프레임: magic(2) + version(1) + JSON 헤더 길이(4) + JSON 헤더 + JPEG 오버레이
+RESULT_MAGIC = b"TN"
+RESULT_VERSION = 1
+RESULT_HEADER = struct.Struct("!2sBI")
+
+
+# 텍스트 메시지를 ("control", dict) 또는 ("frame", base64 문자열)로 분류한다.
+def parse_text_message(raw: str) -> Tuple[str, Any]:
+    if len(raw) > CONTROL_MAX_LEN:
+        return "frame", raw
+
+    msg = raw.strip()
+    if msg.startswith("{"):
+        try:
+            obj = json.loads(msg)
+        except json.JSONDecodeError:
+            obj = None
+        if isinstance(obj, dict):
+            return "control", {**obj, "action": str(obj.get("action", "")).lower()}
+
+    parts = msg.split(":")
+    cmd = parts[0].lower()
+    if len(msg) <= 64 and cmd in COMMANDS:
+        control: Dict[str, Any] = {"action": cmd}
+        if cmd == "init" and len(parts) == len(INIT_THRESHOLD_KEYS) + 1:
+            control.update(zip(INIT_THRESHOLD_KEYS, parts[1:]))
+        return "control", control
+
+    return "frame", msg
+
+
+def compact_json(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+# 오버레이 이미지(bytes)가 있으면 바이너리 결과 프레임으로, 없으면 None 을 돌려준다.
+# base64 문자열 이미지는 텍스트 프레임에서 온 결과이므로 JSON 으로 보내야 한다.
+def encode_result(result: Dict[str, Any]) -> Optional[bytes]:
+    img = result.get("img")
+    if not img or not isinstance(img, (bytes, bytearray, memoryview)):
+        return None
+    meta = {k: v for k, v in result.items() if k != "img"}
+    header = compact_json(meta).encode("utf-8")
+    return RESULT_HEADER.pack(RESULT_MAGIC, RESULT_VERSION, len(header)) + header + bytes(img)
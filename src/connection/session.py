@@ -0,0 +1,236 @@
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from prometheus_client import Counter
+
+from .protocol import INIT_THRESHOLD_KEYS, compact_json, encode_result, parse_text_message
+from ..config import settings
+from ..database.buffer import angle_log_buffer
+from ..schemas.angles import Angle
+from ..services.core import DEFAULT_OUTPUT_MODE, OUTPUT_MODES
+from ..services.inference import inference_executor
+from ..utils.flow import RateController
+
+logger = logging.getLogger('prod')
+
+FRAMES_TOTAL = Counter(
+    "textneck_frames_total", "세션이 받은 프레임 처리 결과", ["result"])
+
+
+class TextneckSession:
+    def __init__(self, ws: WebSocket, user_id: int, max_frame_age: Optional[float] = None):
+        self.ws = ws
+        self.user_id = user_id
+        self.session_id = uuid.uuid4().hex
+        self.max_frame_age = max_frame_age or settings.FRAME_MAX_AGE_SEC
+        # 최신 프레임 하나만 보관한다. 추론이 밀리면 오래된 프레임은 새 프레임으로 교체된다.
+        self.q: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.running = True
+        self.paused = False
+        self.thresholds: Dict[str, float | None] = dict.fromkeys(
+            INIT_THRESHOLD_KEYS)
+        self.output = DEFAULT_OUTPUT_MODE
+        self.stats = {
+            "received": 0,
+            "processed": 0,
+            "reused": 0,
+            "dropped_superseded": 0,
+            "dropped_stale": 0,
+            "dropped_paused": 0,
+            "dropped_throttled": 0,
+        }
+        # 서버가 정한 목표 fps 를 알리고, 이를 넘겨 보내는 프레임은 큐에 넣기 전에 버린다.
+        # init 에 "rate": true 를 보낸 클라이언트만 켠다. 기존 클라이언트는 rate 메시지를 모른다.
+        self.flow: Optional[RateController] = None
+
+    async def run(self):
+        t_recv = asyncio.create_task(self.recv_loop())
+        t_infer = asyncio.create_task(self.infer_loop())
+        done, pending = await asyncio.wait(
+            {t_recv, t_infer}, return_when=asyncio.FIRST_COMPLETED)
+        self.running = False
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for t in done:
+            t.result()
+
+    async def recv_loop(self):
+        while self.running:
+            message = await self.ws.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            frame = message.get("bytes")
+            if frame is not None:
+                self.offer(frame)
+                continue
+
+            kind, value = parse_text_message(message.get("text") or "")
+            if kind == "frame":
+                self.offer(value)
+            else:
+                await self.handle_control(value)
+
+    def offer(self, frame: str | bytes):
+        self.stats["received"] += 1
+        if self.paused:
+            self._drop("dropped_paused")
+            return
+        if self.flow is not None and not self.flow.admit():
+            self._drop("dropped_throttled")
+            return
+        if self.q.full():
+            try:
+                self.q.get_nowait()
+                self._drop("dropped_superseded")
+            except asyncio.QueueEmpty:
+                pass
+        self.q.put_nowait((time.monotonic(), frame))
+
+    async def infer_loop(self):
+        # 엔진 생성은 첫 프레임의 데드라인 밖에서 끝낸다. 그동안 받은 프레임은 최신 것만 남는다.
+        await inference_executor.prepare(self.session_id)
+        while self.running:
+            received_at, frame = await self.q.get()
+            if self.paused:
+                self._drop("dropped_paused")
+                continue
+            if time.monotonic() - received_at > self.max_frame_age:
+                self._drop("dropped_stale")
+                continue
+
+            started = time.monotonic()
+            processed = await inference_executor.run(
+                self.session_id, frame, self.output)
+            if not self.running:
+                break
+            if self.flow is not None:
+                now = time.monotonic()
+                self.flow.observe(now - started, now - received_at)
+
+            await self.record(processed)
+            # 결과 형식은 그 결과를 만든 프레임을 따른다. 바이너리 프레임엔 바이너리, base64 텍스트 프레임엔 JSON.
+            await self.send_result(processed, binary=isinstance(frame, bytes))
+            self.stats["processed"] += 1
+            FRAMES_TOTAL.labels("processed").inc()
+            if processed.get("cached"):
+                # 변화 없는 프레임이라 추론을 건너뛰고 이전 결과를 재사용했다.
+                self.stats["reused"] += 1
+                FRAMES_TOTAL.labels("reused").inc()
+            await self.update_rate()
+
+    async def update_rate(self):
+        if self.flow is None:
+            return
+        fps = self.flow.update(inference_executor.utilization())
+        if fps is not None:
+            await self.ws.send_json({"type": "rate", "fps": fps})
+
+    async def handle_control(self, value: Dict[str, Any]):
+        cmd = value["action"]
+
+        if cmd == "init":
+            for key in INIT_THRESHOLD_KEYS:
+                if key in value:
+                    try:
+                        self.thresholds[key] = float(value[key])
+                    except (TypeError, ValueError):
+                        pass
+            mode = str(value.get("output", self.output)).lower()
+            if mode in OUTPUT_MODES:
+                self.output = mode
+            if settings.FLOW_ENABLED and value.get("rate") is True:
+                self.flow = self.flow or RateController(
+                    min_fps=settings.FLOW_MIN_FPS,
+                    max_fps=settings.FLOW_MAX_FPS,
+                    target_latency=settings.FLOW_TARGET_LATENCY_SEC,
+                    interval=settings.FLOW_UPDATE_INTERVAL_SEC,
+                    grace=settings.FLOW_GRACE_SEC,
+                )
+            else:
+                self.flow = None
+            self.pause()
+            await self.ws.send_json(self._with_fps({
+                "status": "initialized",
+                "paused": True,
+                "output": self.output,
+                "thresholds": self.thresholds
+            }))
+        elif cmd == "pause":
+            if not self.paused:
+                self.pause()
+                await self.ws.send_json({"status": "paused"})
+            else:
+                await self.ws.send_json({"status": "already_paused"})
+        elif cmd == "resume":
+            if self.paused:
+                self.paused = False
+                await self.ws.send_json(self._with_fps({"status": "resumed"}))
+            else:
+                await self.ws.send_json({"status": "already_running"})
+        elif cmd == "stats":
+            await self.ws.send_json(self._with_fps({"status": "stats", "frames": self.stats}))
+        elif cmd == "stop":
+            self.running = False
+            await self.ws.send_json({"status": "stopping", "frames": self.stats})
+            await self.ws.close()
+        else:
+            await self.ws.send_json({"status": "unknown_command"})
+
+    def _with_fps(self, reply: Dict[str, Any]) -> Dict[str, Any]:
+        # 속도 제어를 켠 세션만 상태 응답에 현재 목표 fps 를 싣는다. 따로 rate 메시지를 보내지 않는다.
+        if self.flow is not None:
+            self.flow.announce()
+            reply["fps"] = self.flow.announced
+        return reply
+
+    def pause(self):
+        self.paused = True
+        while not self.q.empty():
+            self.q.get_nowait()
+            self._drop("dropped_paused")
+
+    async def record(self, processed: Dict[str, Any]):
+        if not processed.get("has_angle"):
+            return
+        val = processed.get("neck_angle_deg")
+        if val is None:
+            val = processed.get("angle_value")
+        if val is None:
+            return
+        # 프로세스 공용 write-behind 버퍼가 모든 세션의 로그를 모아 bulk_write 한다.
+        angle_threshold = self.thresholds["angle_threshold"]
+        if angle_threshold is None and settings.ROLLUP_DEFAULT_ANGLE_THRESHOLD > 0:
+            angle_threshold = settings.ROLLUP_DEFAULT_ANGLE_THRESHOLD
+        await angle_log_buffer.add(self.user_id, [Angle(
+            angle=float(val),
+            shoulder_y_diff=processed.get("shoulder_y_diff_px"),
+            shoulder_y_avg=processed.get("shoulder_y_avg_px"),
+            logged_at=datetime.now(timezone.utc)
+        )], angle_threshold)
+
+    async def send_result(self, result: Dict[str, Any], binary: bool = False):
+        if not binary:
+            await self.ws.send_json(result)
+            return
+        frame = encode_result(result)
+        if frame is None:
+            await self.ws.send_text(compact_json({k: v for k, v in result.items() if k != "img"}))
+        else:
+            await self.ws.send_bytes(frame)
+
+    async def close(self):
+        self.running = False
+        angle_log_buffer.request_flush()
+        inference_executor.release(self.session_id)
+        logger.info(f"세션 ({self.session_id}) 종료. user_id={self.user_id} frames={self.stats}")
+
+    def _drop(self, reason: str):
+        self.stats[reason] += 1
+        FRAMES_TOTAL.labels(reason).inc()
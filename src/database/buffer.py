@@ -0,0 +1,209 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..config import settings
+from ..models.angles import AngleLog, AngleRollup
+from .orm import Database
+from .rollups import build_rollup_updates
+
+logger = logging.getLogger('prod')
+
+FLUSH_SECONDS = Histogram(
+    "angle_buffer_flush_seconds", "각도 로그 insert_many 소요 시간",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+FLUSH_BATCH_SIZE = Histogram(
+    "angle_buffer_flush_batch_size", "한 번의 insert_many 에 포함된 각도 로그 수",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+FLUSH_USERS = Histogram(
+    "angle_buffer_flush_users", "한 번의 flush 에 포함된 사용자 수",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+PENDING = Gauge("angle_buffer_pending", "flush 대기 중인 각도 로그 수")
+FLUSH_ERRORS = Counter("angle_buffer_flush_errors_total", "실패한 flush 수")
+DROPPED = Counter(
+    "angle_buffer_dropped_total", "메모리 한도 초과로 버려진 각도 로그 수")
+ROLLUP_ERRORS = Counter(
+    "angle_buffer_rollup_errors_total", "실패한 rollup 갱신 수")
+ROLLUP_BUCKETS = Histogram(
+    "angle_buffer_rollup_buckets", "한 번의 flush 에서 갱신된 rollup 버킷 수",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500),
+)
+BACKPRESSURE_WAITS = Counter(
+    "angle_buffer_backpressure_waits_total", "버퍼가 가득 차 add 가 대기한 횟수")
+
+
+class AngleLogBuffer:
+    def __init__(
+        self,
+        repo: Database,
+        rollup_repo: Optional[Database] = None,
+        max_batch: int = 1000,
+        flush_interval: float = 1.0,
+        max_pending: int = 50000,
+        add_timeout: float = 1.0
+    ):
+        self.repo = repo
+        self.rollup_repo = rollup_repo
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.add_timeout = add_timeout
+        self._pending: Dict[int, List[Dict[str, Any]]] = {}
+        # 버퍼에 쌓인 것 + 현재 쓰고 있는 것까지 합친 로그 수 (메모리 한도 기준)
+        self._count = 0
+        self._cond = asyncio.Condition()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # 루프를 취소하지 않는다. 진행 중인 insert_many 가 취소되면 이미 꺼낸 배치가 사라진다.
+        # 루프가 진행 중인 flush 를 마치고 스스로 끝나게 한 뒤 남은 로그를 한 번 더 비운다.
+        task, self._task = self._task, None
+        if task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+
+    async def add(
+        self,
+        user_id: int,
+        items: List[BaseModel] | List[Dict[str, Any]],
+        angle_threshold: Optional[float] = None
+    ):
+        payload = Database.to_payload(items)
+        if not payload:
+            return
+        for item in payload:
+            item["breach"] = angle_threshold is not None and float(
+                item.get("angle", 0.0)) >= angle_threshold
+        async with self._cond:
+            if self._count + len(payload) > self.max_pending:
+                BACKPRESSURE_WAITS.inc()
+                self._wakeup.set()
+                try:
+                    await asyncio.wait_for(
+                        self._cond.wait_for(
+                            lambda: self._count + len(payload) <= self.max_pending),
+                        timeout=self.add_timeout)
+                except asyncio.TimeoutError:
+                    # DB 가 계속 밀리면 세션을 무한정 붙잡지 않고 로그를 버린다.
+                    DROPPED.inc(len(payload))
+                    logger.warning(
+                        f"각도 로그 버퍼 한도 초과, user_id={user_id} {len(payload)}건 버림")
+                    return
+            self._pending.setdefault(user_id, []).extend(payload)
+            self._count += len(payload)
+            PENDING.set(self._count)
+            if self._count >= self.max_batch:
+                self._wakeup.set()
+
+    def request_flush(self):
+        self._wakeup.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            async with self._cond:
+                batch, self._pending = self._pending, {}
+            entries = [(user_id, item) for user_id, payload in batch.items() for item in payload]
+            if not entries:
+                return
+            FLUSH_USERS.observe(len(batch))
+
+            # insert_many 한 번에 max_batch 건까지만 보낸다. 실패하면 아직 못 쓴 로그를 되돌려 놓는다.
+            inserted: List[Dict[str, Any]] = []
+            written = 0
+            step = max(1, self.max_batch)
+            try:
+                while written < len(entries):
+                    chunk = entries[written:written + step]
+                    inserted += await self._insert(
+                        [{"user_id": user_id, **item} for user_id, item in chunk])
+                    written += len(chunk)
+            except Exception as e:
+                FLUSH_ERRORS.inc()
+                logger.error(f"각도 로그 flush 실패 ({len(entries) - written}건): {e}", exc_info=True)
+                await self._requeue(entries[written:])
+
+            if inserted:
+                await self._update_rollups(inserted)
+            async with self._cond:
+                self._count -= written
+                PENDING.set(self._count)
+                self._cond.notify_all()
+
+    async def _insert(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # 실제로 저장된 문서를 돌려준다. rollup 은 이것으로만 계산해 AngleLog 와 어긋나지 않게 한다.
+        started = time.perf_counter()
+        try:
+            await self.repo.insert_many(documents)
+            return documents
+        except BulkWriteError as e:
+            # 순서 없는 insert 는 일부만 실패할 수 있다. 다시 넣으면 중복이 생기므로 실패분은 버리고 기록만 한다.
+            FLUSH_ERRORS.inc()
+            failed = {err.get("index") for err in e.details.get("writeErrors", [])}
+            DROPPED.inc(len(failed))
+            logger.error(f"각도 로그 일부 저장 실패 ({len(failed)}/{len(documents)}건): {e}")
+            return [doc for i, doc in enumerate(documents) if i not in failed]
+        finally:
+            FLUSH_SECONDS.observe(time.perf_counter() - started)
+            FLUSH_BATCH_SIZE.observe(len(documents))
+
+    async def _update_rollups(self, documents: List[Dict[str, Any]]):
+        if self.rollup_repo is None:
+            return
+        ops = build_rollup_updates(documents)
+        try:
+            await self.rollup_repo.bulk_write(ops)
+            ROLLUP_BUCKETS.observe(len(ops))
+        except Exception as e:
+            # 로그는 이미 저장됐으므로 재시도하지 않는다. 재시도하면 로그가 중복 저장된다.
+            ROLLUP_ERRORS.inc()
+            logger.error(f"rollup 갱신 실패 ({len(ops)}개 버킷): {e}", exc_info=True)
+
+    async def _requeue(self, entries: List[Tuple[int, Dict[str, Any]]]):
+        # 실패한 로그는 다음 flush 에 다시 시도한다. 그 사이 쌓인 로그보다 앞에 둔다.
+        batch: Dict[int, List[Dict[str, Any]]] = {}
+        for user_id, item in entries:
+            batch.setdefault(user_id, []).append(item)
+        async with self._cond:
+            for user_id, payload in batch.items():
+                self._pending[user_id] = payload + \
+                    self._pending.get(user_id, [])
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("각도 로그 flush 루프 오류")
+
+
+angle_log_buffer = AngleLogBuffer(
+    Database(AngleLog),
+    rollup_repo=Database(AngleRollup),
+    max_batch=settings.ANGLE_BUFFER_MAX_BATCH,
+    flush_interval=settings.ANGLE_BUFFER_FLUSH_INTERVAL_SEC,
+    max_pending=settings.ANGLE_BUFFER_MAX_PENDING,
+    add_timeout=settings.ANGLE_BUFFER_ADD_TIMEOUT_SEC,
+)
@@ -3,6 +3,7 @@ from beanie import init_beanie
 import logging
 from ..config import settings
 from ..models.users import User
+from ..models.angles import AngleLog, AngleRollup
 logger = logging.getLogger('prod')
 
 
@@ -11,7 +12,7 @@ async def initialize_database():
         client = AsyncIOMotorClient(settings.DATABASE_URL)
         await init_beanie(
             database=client.get_default_database(),
-            document_models=[User]
+            document_models=[User, AngleLog, AngleRollup]
         )
         logger.info('데이터베이스 연결 완료')
     except Exception as e:
@@ -0,0 +1,64 @@
+import sys
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from ..models.users import User
+from ..models.angles import AngleLog, AngleRollup
+from .connection import initialize_database
+from .rollups import build_rollup_updates
+
+logger = logging.getLogger('prod')
+
+
+async def migrate_embedded_angles(batch_size: int = 100, dry_run: bool = False) -> Dict[str, Any]:
+    # users.angles_logs 임베디드 배열을 angle_logs 시계열 컬렉션으로 옮기고 원본 배열을 비운다.
+    # 사용자 단위로 insert 후 비우므로, 중간에 중단되면 그 사용자 한 명분만 다시 옮겨질 수 있다.
+    users = User.get_pymongo_collection()
+    logs = AngleLog.get_pymongo_collection()
+    rollups = AngleRollup.get_pymongo_collection()
+    stats = {"users": 0, "logs": 0}
+
+    cursor = users.find(
+        {"angles_logs.0": {"$exists": True}},
+        {"user_id": 1, "angles_logs": 1},
+        batch_size=batch_size
+    )
+    async for doc in cursor:
+        user_id = doc["user_id"]
+        documents = []
+        for item in doc.get("angles_logs") or []:
+            if not isinstance(item, dict) or item.get("angle") is None:
+                continue
+            logged_at = item.get("logged_at") or datetime.now(timezone.utc)
+            documents.append({
+                "user_id": user_id,
+                "angle": float(item["angle"]),
+                "shoulder_y_diff": item.get("shoulder_y_diff"),
+                "shoulder_y_avg": item.get("shoulder_y_avg"),
+                "logged_at": logged_at,
+            })
+
+        stats["users"] += 1
+        stats["logs"] += len(documents)
+        if dry_run:
+            continue
+
+        if documents:
+            await logs.insert_many(documents, ordered=False)
+            await rollups.bulk_write(build_rollup_updates(documents), ordered=False)
+        await users.update_one({"_id": doc["_id"]}, {"$set": {"angles_logs": []}})
+        logger.info(f"사용자 ({user_id}) 각도 로그 {len(documents)}건 이전 완료")
+
+    return stats
+
+
+async def _main(dry_run: bool):
+    await initialize_database()
+    stats = await migrate_embedded_angles(dry_run=dry_run)
+    print(f"migrated users={stats['users']} logs={stats['logs']} dry_run={dry_run}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(dry_run="--dry-run" in sys.argv[1:]))
@@ -1,7 +1,12 @@
+from datetime import datetime
 from typing import Any, Generic, List, Optional, Type, TypeVar, Union, Dict
 
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ..schemas.writes import WriteResult
 
 TDoc = TypeVar("TDoc", bound=Document)
 
@@ -31,6 +36,55 @@ class Database(Generic[TDoc]):
     async def find_one(self, filter_: Dict[str, Any]) -> Optional[TDoc]:
         return await self.model.find_one(filter_)
 
+    async def find_time_range(
+        self,
+        filter_: Dict[str, Any],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 0,
+        time_field: str = "logged_at",
+        newest_first: bool = True,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        query = dict(filter_)
+        time_range: Dict[str, Any] = {}
+        if start is not None:
+            time_range["$gte"] = start
+        if end is not None:
+            time_range["$lt"] = end
+        if time_range:
+            query[time_field] = time_range
+
+        coll = self.model.get_pymongo_collection()
+        cursor = coll.find(query, projection).sort(
+            time_field, DESCENDING if newest_first else ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    def find_cursor(
+        self,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[tuple]] = None,
+        limit: int = 0
+    ):
+        # 결과를 리스트로 모으지 않고 async for 로 흘려보낼 때 사용한다.
+        coll = self.model.get_pymongo_collection()
+        cursor = coll.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> WriteResult:
+        if not documents:
+            return WriteResult(acknowledged=True)
+        coll = self.model.get_pymongo_collection()
+        result = await coll.insert_many(documents, ordered=False)
+        return WriteResult(acknowledged=result.acknowledged, inserted_count=len(result.inserted_ids))
+
     async def delete(self, _id: Union[PydanticObjectId, str]) -> bool:
         doc = await self.get_by_mongo_id(_id)
         if not doc:
@@ -58,15 +112,84 @@ class Database(Generic[TDoc]):
         await doc.update({"$set": data})
         return await self.get_by_mongo_id(_id)
 
+    async def ensure_by_user_id(
+        self,
+        user_id: int,
+        defaults: Optional[Dict[str, Any]] = None
+    ) -> WriteResult:
+        # 문서를 읽지 않고 없을 때만 만든다. upserted_count 로 새로 만들었는지 알 수 있다.
+        coll = self.model.get_pymongo_collection()
+        try:
+            result = await coll.update_one(
+                {"user_id": user_id},
+                {"$setOnInsert": {"user_id": user_id, **(defaults or {})}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # 다른 프로세스가 같은 사용자를 동시에 만들었다. 이미 존재하는 것으로 본다.
+            return WriteResult(acknowledged=True, matched_count=1)
+        return WriteResult(
+            acknowledged=result.acknowledged,
+            matched_count=result.matched_count,
+            upserted_count=1 if result.upserted_id is not None else 0
+        )
+
     async def push_many_by_user_id(
         self,
         user_id: int,
         items: List[BaseModel] | List[Dict[str, Any]],
-        slice_max: int = 5000
-    ) -> Optional[TDoc]:
-        if not items:
-            return await self.model.find_one(self.model.user_id == user_id)
+        slice_max: int = 5000,
+        readback: Optional[Dict[str, Any]] = None
+    ) -> WriteResult:
+        # 기본은 쓰기 확인만 돌려준다. 문서가 필요하면 readback 에 projection 을 넘긴다.
+        # 예: readback={"angles_logs": {"$slice": -10}}
+        coll = self.model.get_pymongo_collection()
+        payload = self.to_payload(items) if items else []
 
+        if not payload:
+            document = None
+            if readback is not None:
+                document = await coll.find_one({"user_id": user_id}, readback)
+            return WriteResult(acknowledged=True, document=document)
+
+        update = {
+            "$setOnInsert": {"user_id": user_id},
+            "$push": {"angles_logs": {"$each": payload, "$slice": -int(slice_max)}}
+        }
+
+        if readback is not None:
+            document = await coll.find_one_and_update(
+                {"user_id": user_id},
+                update,
+                projection=readback,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return WriteResult(acknowledged=True, matched_count=1, modified_count=1, document=document)
+
+        result = await coll.update_one({"user_id": user_id}, update, upsert=True)
+        return WriteResult(
+            acknowledged=result.acknowledged,
+            matched_count=result.matched_count,
+            modified_count=result.modified_count,
+            upserted_count=1 if result.upserted_id is not None else 0
+        )
+
+    async def bulk_write(self, ops: List[Any]) -> WriteResult:
+        if not ops:
+            return WriteResult(acknowledged=True)
+        coll = self.model.get_pymongo_collection()
+        result = await coll.bulk_write(ops, ordered=False)
+        return WriteResult(
+            acknowledged=result.acknowledged,
+            matched_count=result.matched_count,
+            modified_count=result.modified_count,
+            upserted_count=result.upserted_count,
+            inserted_count=result.inserted_count
+        )
+
+    @staticmethod
+    def to_payload(items: List[BaseModel] | List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         payload: List[Dict[str, Any]] = []
         for it in items:
             if isinstance(it, BaseModel):
@@ -78,17 +201,4 @@ class Database(Generic[TDoc]):
                 data = {k: v for k, v in it.items() if v is not None}
             if data:
                 payload.append(data)
-
-        if not payload:
-            return await self.model.find_one(self.model.user_id == user_id)
-
-        coll = self.model.get_pymongo_collection()
-        await coll.update_one(
-            {"user_id": user_id},
-            {
-                "$setOnInsert": {"user_id": user_id},
-                "$push": {"angles_logs": {"$each": payload, "$slice": -int(slice_max)}}
-            },
-            upsert=True
-        )
-        return await self.model.find_one(self.model.user_id == user_id)
+        return payload
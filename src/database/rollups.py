@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from pymongo import UpdateOne
+
+ROLLUP_GRANULARITIES = ("minute", "hour", "day")
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    else:
+        ts = ts.astimezone(timezone.utc)
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"지원하지 않는 rollup 단위입니다: {granularity}")
+
+
+def build_rollup_updates(documents: List[Dict[str, Any]]) -> List[UpdateOne]:
+    # 한 번의 flush 에 들어온 로그를 (user, 단위, 버킷) 별로 먼저 합쳐 버킷당 upsert 하나로 만든다.
+    acc: Dict[Tuple[int, str, datetime], List[Any]] = {}
+    for doc in documents:
+        angle = doc.get("angle")
+        logged_at = doc.get("logged_at")
+        if angle is None or logged_at is None:
+            continue
+        angle = float(angle)
+        breach = 1 if doc.get("breach") else 0
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (doc["user_id"], granularity,
+                   bucket_start(logged_at, granularity))
+            a = acc.get(key)
+            if a is None:
+                acc[key] = [1, angle, angle * angle, angle, angle, breach]
+            else:
+                a[0] += 1
+                a[1] += angle
+                a[2] += angle * angle
+                a[3] = min(a[3], angle)
+                a[4] = max(a[4], angle)
+                a[5] += breach
+
+    return [
+        UpdateOne(
+            {"user_id": user_id, "granularity": granularity, "bucket": bucket},
+            {
+                "$inc": {
+                    "samples": count,
+                    "angle_sum": total,
+                    "angle_sum_sq": total_sq,
+                    "breach_count": breaches
+                },
+                "$min": {"angle_min": low},
+                "$max": {"angle_max": high},
+            },
+            upsert=True
+        )
+        for (user_id, granularity, bucket), (count, total, total_sq, low, high, breaches) in acc.items()
+    ]
@@ -5,6 +5,9 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.database.connection import initialize_database
+from src.database.buffer import angle_log_buffer
+from src.services.engine import engine_pool
+from src.services.inference import inference_executor
 from .config import settings
 from .routers.users import user_router
 from .routers.textneck import textneck_router
@@ -16,7 +19,12 @@ logging.config.dictConfig(LOGGING_CONFIG)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await initialize_database()
+    await angle_log_buffer.start()
+    await inference_executor.start()
     yield
+    inference_executor.shutdown()
+    engine_pool.close()
+    await angle_log_buffer.stop()
 
 app = FastAPI(
     lifespan=lifespan,
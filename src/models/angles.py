@@ -0,0 +1,48 @@
+
+from datetime import datetime
+from beanie import Document, Granularity, TimeSeriesConfig
+import pymongo
+
+
+class AngleLog(Document):
+    user_id: int
+    angle: float
+    shoulder_y_diff: float | None = None
+    shoulder_y_avg: float | None = None
+    # 기록 당시 세션의 angle_threshold 를 넘었는지 여부
+    breach: bool = False
+    logged_at: datetime
+
+    class Settings:
+        name = "angle_logs"
+        timeseries = TimeSeriesConfig(
+            time_field="logged_at",
+            meta_field="user_id",
+            granularity=Granularity.seconds
+        )
+        indexes = [
+            [("user_id", pymongo.ASCENDING), ("logged_at", pymongo.DESCENDING)],
+        ]
+
+
+class AngleRollup(Document):
+    # 사용자별 시간 버킷(UTC) 집계. 쓰기 경로에서 $inc/$min/$max 로 증분 갱신된다.
+    user_id: int
+    granularity: str
+    bucket: datetime
+    samples: int = 0
+    angle_sum: float = 0.0
+    angle_sum_sq: float = 0.0
+    angle_min: float | None = None
+    angle_max: float | None = None
+    breach_count: int = 0
+
+    class Settings:
+        name = "angle_rollups"
+        indexes = [
+            pymongo.IndexModel(
+                [("user_id", pymongo.ASCENDING), ("granularity", pymongo.ASCENDING),
+                 ("bucket", pymongo.ASCENDING)],
+                unique=True
+            ),
+        ]
@@ -7,6 +7,8 @@ from pydantic import Field
 
 class User(Document):
     user_id: int = Indexed(int, unique=True)
+    # 레거시 임베디드 로그. 새 로그는 angle_logs 시계열 컬렉션(AngleLog)에 쌓이며
+    # 기존 배열은 src.database.migrations 로 옮긴 뒤 비워진다.
     angles_logs: List[Link[Angle]] = Field(default_factory=list)
 
     class Settings:
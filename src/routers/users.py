@@ -1,10 +1,18 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Annotated, Literal, Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
+from ..config import settings
 from ..models.users import User
+from ..models.angles import AngleLog
 from ..database.orm import Database
 from ..auth.authentication import get_valid_token_payload
 from ..schemas.jwt import TokenData
+from ..schemas.angles import Angle
+from ..schemas.users import User as UserSettings
+from ..schemas.rollups import RollupResponse
+from ..services.dashboard import DashBoard, InvalidCursor, decode_cursor
 import logging
 logger = logging.getLogger('prod')
 
@@ -15,6 +23,7 @@ user_router = APIRouter(
 )
 
 user_db = Database(User)
+angle_db = Database(AngleLog)
 
 
 @user_router.get("/")
@@ -23,9 +32,16 @@ async def get_my_settings(
 ):
 
     my_settings_doc: User | None = None
+    recent_logs: list[dict] = []
 
     try:
         my_settings_doc = await user_db.get_by_user_id(user_id=current_user_data.user_id)
+        if my_settings_doc is not None:
+            recent_logs = await angle_db.find_time_range(
+                {"user_id": current_user_data.user_id},
+                limit=settings.DASHBOARD_RECENT_LOGS,
+                projection={"_id": 0, "user_id": 0}
+            )
     except Exception as e:
         logger.exception(f"유저 설정 ({current_user_data.user_id}) 불러오기 실패: {e}😡🤖")
         raise HTTPException(
@@ -39,9 +55,66 @@ async def get_my_settings(
             detail="사용자 설정 정보를 찾을 수 없습니다."
         )
 
-    logging.info(my_settings_doc)
+    logger.debug(
+        f"유저 설정 ({current_user_data.user_id}) 조회: 최근 로그 {len(recent_logs)}건")
 
     return {
         "message": f"{current_user_data.user_id}님의 설정 정보를 성공적으로 가져왔습니다.",
-        "settings": my_settings_doc.model_dump_json(),
+        "settings": UserSettings(
+            user_id=current_user_data.user_id,
+            angles_logs=[Angle(**log) for log in reversed(recent_logs)]
+        ).model_dump(mode="json"),
     }
+
+
+@user_router.get("/rollups", response_model=RollupResponse)
+async def get_my_rollups(
+    current_user_data: Annotated[TokenData, Depends(get_valid_token_payload)],
+    granularity: Literal["minute", "hour", "day"] = "hour",
+    start: Annotated[Optional[datetime], Query(alias="from")] = None,
+    end: Annotated[Optional[datetime], Query(alias="to")] = None,
+):
+    try:
+        buckets = await DashBoard.get_rollups(
+            current_user_data.user_id, granularity, start, end)
+    except Exception as e:
+        logger.exception(f"유저 rollup ({current_user_data.user_id}) 불러오기 실패: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="자세 통계를 불러오는 중 서버 오류가 발생했습니다."
+        )
+
+    return RollupResponse(
+        user_id=current_user_data.user_id,
+        granularity=granularity,
+        buckets=buckets
+    )
+
+
+@user_router.get("/history")
+async def get_my_history(
+    current_user_data: Annotated[TokenData, Depends(get_valid_token_payload)],
+    start: Annotated[Optional[datetime], Query(alias="from")] = None,
+    end: Annotated[Optional[datetime], Query(alias="to")] = None,
+    limit: Annotated[int, Query(ge=1, le=settings.DASHBOARD_HISTORY_MAX_LIMIT)] = 1000,
+    cursor: Optional[str] = None,
+    order: Literal["desc", "asc"] = "desc",
+):
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursor as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return StreamingResponse(
+        DashBoard.stream_history(
+            current_user_data.user_id,
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=cursor,
+            newest_first=order == "desc"
+        ),
+        media_type="application/x-ndjson"
+    )
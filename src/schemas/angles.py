@@ -4,7 +4,8 @@ from datetime import datetime, timezone
 
 class Angle(BaseModel):
     angle: float
-    shoulder_y_diff: float
-    shoulder_y_avg: float
+    # 이전된 로그나 어깨를 못 찾은 프레임은 값이 없을 수 있다 (AngleLog 와 동일).
+    shoulder_y_diff: float | None = None
+    shoulder_y_avg: float | None = None
     logged_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+
+class RollupBucket(BaseModel):
+    bucket: datetime
+    count: int
+    mean: float | None = None
+    std: float | None = None
+    min: float | None = None
+    max: float | None = None
+    breach_count: int = 0
+    breach_ratio: float | None = None
+
+
+class RollupResponse(BaseModel):
+    user_id: int
+    granularity: str
+    buckets: List[RollupBucket]
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+
+class WriteResult(BaseModel):
+    acknowledged: bool
+    matched_count: int = 0
+    modified_count: int = 0
+    upserted_count: int = 0
+    inserted_count: int = 0
+    document: Optional[Dict[str, Any]] = None
@@ -2,11 +2,73 @@ import cv2
 import base64
 import numpy as np
 import mediapipe as mp
-from typing import Dict, Any
+from typing import Dict, Any, NamedTuple, Optional, Tuple
 import logging
 
+from ..config import settings
+from .engine import LandmarkEngine
+from ..utils.gate import thumbnail
+
 logger = logging.getLogger('prod')
 
+# metrics: 각도/어깨 수치만, landmarks: 핵심 좌표 추가, overlay: 오버레이 이미지까지 (기존 동작)
+OUTPUT_MODES = ("metrics", "landmarks", "overlay")
+DEFAULT_OUTPUT_MODE = "overlay"
+
+Point = Tuple[int, int]
+Region = Tuple[float, float, float, float]
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6,
+                     0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_REDUCED_COLOR_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+# 이보다 작은 ROI 는 트래킹이 불안정하다고 보고 전체 프레임을 사용한다.
+_MIN_ROI_SIDE = 64
+
+
+class IngestedFrame(NamedTuple):
+    rgb: np.ndarray
+    # 원본 해상도 (h, w) 와 원본 픽셀 좌표계 기준 크롭 영역 (x0, y0, x1, y1)
+    size: Tuple[int, int]
+    region: Region
+
+
+def _jpeg_size(data) -> Optional[Tuple[int, int]]:
+    # 전체 디코딩 없이 JPEG SOF 세그먼트에서 (h, w) 만 읽는다.
+    buf = memoryview(data)
+    if len(buf) < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+    i = 2
+    n = len(buf)
+    while i + 9 < n:
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        seg_len = (buf[i + 2] << 8) | buf[i + 3]
+        if marker in _JPEG_SOF_MARKERS:
+            h = (buf[i + 5] << 8) | buf[i + 6]
+            w = (buf[i + 7] << 8) | buf[i + 8]
+            return (h, w) if h and w else None
+        i += 2 + seg_len
+    return None
+
+
+def _decode_flag(src_size: Optional[Tuple[int, int]]) -> int:
+    max_side = settings.INGEST_MAX_SIDE
+    if src_size is None or max_side <= 0:
+        return cv2.IMREAD_COLOR
+    longest = max(src_size)
+    for factor, flag in _REDUCED_COLOR_FLAGS:
+        if longest / factor >= max_side:
+            return flag
+    return cv2.IMREAD_COLOR
+
 
 class CoreService:
     mp_drawing = mp.solutions.drawing_utils
@@ -25,26 +87,83 @@ class CoreService:
         return float(angle)
 
     @staticmethod
-    def process_image_frame(img_bytes_b64: str) -> Dict[str, Any]:
+    def empty_result(img: Optional[str | bytes] = None) -> Dict[str, Any]:
+        return {
+            "has_angle": False,
+            "angle_value": None,
+            "neck_angle_deg": None,
+            "shoulder_y_diff_px": None,
+            "shoulder_y_avg_px": None,
+            "img": img
+        }
+
+    @staticmethod
+    def _infer(engine: LandmarkEngine, img_rgb: np.ndarray):
+        # 백엔드에 없는 그래프의 결과는 None 으로 돌려준다.
+        with engine.lock:
+            if engine.closed:
+                raise RuntimeError("추론 엔진이 이미 닫혔습니다.")
+            face_results = engine.face_mesh.process(
+                img_rgb) if engine.face_mesh is not None else None
+            pose_results = engine.pose.process(
+                img_rgb) if engine.pose is not None else None
+            return face_results, pose_results
+
+    @staticmethod
+    def process_image_frame(
+        img_bytes_b64: str,
+        engine: Optional[LandmarkEngine] = None,
+        output: str = DEFAULT_OUTPUT_MODE
+    ) -> Dict[str, Any]:
         try:
             img_bytes = base64.b64decode(img_bytes_b64)
-            np_arr = np.frombuffer(img_bytes, np.uint8)
-            img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-            if img is None:
-                return {
-                    "has_angle": False,
-                    "angle_value": None,
-                    "neck_angle_deg": None,
-                    "shoulder_y_diff_px": None,
-                    "shoulder_y_avg_px": None,
-                    "img": img_bytes_b64
-                }
+        except Exception as e:
+            logger.error(f"process_image_frame error: {e}", exc_info=True)
+            return CoreService.empty_result(img_bytes_b64)
+
+        result = CoreService.process_image_bytes(img_bytes, engine, output)
+        if output != "overlay":
+            return result
+        if result["img"] is None:
+            result["img"] = img_bytes_b64
+        else:
+            result["img"] = base64.b64encode(result["img"]).decode("utf-8")
+        return result
+
+    @staticmethod
+    def process_image_bytes(
+        img_bytes: bytes,
+        engine: Optional[LandmarkEngine] = None,
+        output: str = DEFAULT_OUTPUT_MODE
+    ) -> Dict[str, Any]:
+        # 바이너리 프레임 경로: 입력을 복사 없이 디코딩하고 오버레이는 JPEG 바이트 그대로 돌려준다.
+        try:
+            gate = engine.gate if engine is not None else None
+            thumb = None
+            if gate is not None:
+                thumb = thumbnail(img_bytes)
+                reuse, cached = gate.check(thumb)
+                if reuse and cached is not None and cached[0] == output:
+                    return {**cached[1], "cached": True}
+
+            frame = CoreService._ingest(img_bytes, engine)
+            if frame is None:
+                return CoreService.empty_result()
+
+            h, w = frame.size
+            if engine is None:
+                with LandmarkEngine() as one_shot:
+                    face_results, pose_results = CoreService._infer(
+                        one_shot, frame.rgb)
+            else:
+                face_results, pose_results = CoreService._infer(
+                    engine, frame.rgb)
 
-            img = cv2.flip(img, 1)
-            h, w, _ = img.shape
-            black_bg_img = np.zeros((h, w, 3), dtype=np.uint8)
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            # 크롭/축소된 입력에서 얻은 정규화 좌표를 원본 픽셀 좌표로 되돌린다.
+            rx0, ry0, rx1, ry1 = frame.region
+
+            def to_px(lm) -> Point:
+                return (int(rx0 + lm.x * (rx1 - rx0)), int(ry0 + lm.y * (ry1 - ry0)))
 
             angle = None
             nose = None
@@ -53,96 +172,178 @@ class CoreService:
             shoulder_y_diff = None
             shoulder_y_avg = None
 
-            with CoreService.mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1) as face_mesh, \
-                    CoreService.mp_pose.Pose(static_image_mode=False, model_complexity=1) as pose:
+            if face_results is not None:
+                if face_results.multi_face_landmarks:
+                    nose = to_px(
+                        face_results.multi_face_landmarks[0].landmark[1])
+            elif pose_results is not None and pose_results.pose_landmarks:
+                # pose 백엔드: FaceMesh 없이 Pose 0번(코) 랜드마크를 사용한다.
+                nose = to_px(pose_results.pose_landmarks.landmark[
+                    CoreService.mp_pose.PoseLandmark.NOSE
+                ])
 
-                face_results = face_mesh.process(img_rgb)
-                pose_results = pose.process(img_rgb)
+            if pose_results is not None and pose_results.pose_landmarks:
+                left_shoulder_lm = pose_results.pose_landmarks.landmark[
+                    CoreService.mp_pose.PoseLandmark.LEFT_SHOULDER
+                ]
+                right_shoulder_lm = pose_results.pose_landmarks.landmark[
+                    CoreService.mp_pose.PoseLandmark.RIGHT_SHOULDER
+                ]
+                left_shoulder = to_px(left_shoulder_lm)
+                right_shoulder = to_px(right_shoulder_lm)
+                shoulder_y_diff = abs(left_shoulder[1] - right_shoulder[1])
+                shoulder_y_avg = (
+                    left_shoulder[1] + right_shoulder[1]) / 2.0
 
-                mp_drawing = CoreService.mp_drawing
-                mp_face_mesh = CoreService.mp_face_mesh
+            if nose and left_shoulder and right_shoulder:
+                if nose != (0, 0) and left_shoulder != (0, 0) and right_shoulder != (0, 0):
+                    angle = CoreService._calculate_angle(
+                        left_shoulder, nose, right_shoulder)
 
-                if face_results.multi_face_landmarks:
-                    spec = mp_drawing.DrawingSpec(
-                        color=(0, 255, 128), thickness=1, circle_radius=1)
-                    for face_landmarks in face_results.multi_face_landmarks:
-                        mp_drawing.draw_landmarks(
-                            image=black_bg_img,
-                            landmark_list=face_landmarks,
-                            connections=mp_face_mesh.FACEMESH_CONTOURS,
-                            landmark_drawing_spec=spec,
-                            connection_drawing_spec=spec
-                        )
-                    face_landmarks = face_results.multi_face_landmarks[0]
-                    nose_lm = face_landmarks.landmark[1]
-                    nose = (int(nose_lm.x * w), int(nose_lm.y * h))
-
-                if pose_results.pose_landmarks:
-                    left_shoulder_lm = pose_results.pose_landmarks.landmark[
-                        CoreService.mp_pose.PoseLandmark.LEFT_SHOULDER
-                    ]
-                    right_shoulder_lm = pose_results.pose_landmarks.landmark[
-                        CoreService.mp_pose.PoseLandmark.RIGHT_SHOULDER
-                    ]
-                    left_shoulder = (int(left_shoulder_lm.x * w),
-                                     int(left_shoulder_lm.y * h))
-                    right_shoulder = (int(right_shoulder_lm.x * w),
-                                      int(right_shoulder_lm.y * h))
-                    shoulder_y_diff = abs(left_shoulder[1] - right_shoulder[1])
-                    shoulder_y_avg = (
-                        left_shoulder[1] + right_shoulder[1]) / 2.0
-
-                if nose and left_shoulder and right_shoulder:
-                    if nose != (0, 0) and left_shoulder != (0, 0) and right_shoulder != (0, 0):
-                        angle = CoreService._calculate_angle(
-                            left_shoulder, nose, right_shoulder)
-                        cv2.circle(black_bg_img, nose, 5, (0, 255, 0), -1)
-                        cv2.circle(black_bg_img, left_shoulder,
-                                   5, (0, 255, 0), -1)
-                        cv2.circle(black_bg_img, right_shoulder,
-                                   5, (0, 255, 0), -1)
-                        cv2.line(black_bg_img, left_shoulder,
-                                 nose, (0, 255, 0), 2)
-                        cv2.line(black_bg_img, right_shoulder,
-                                 nose, (0, 255, 0), 2)
-                        cv2.putText(
-                            black_bg_img, f"Angle: {angle:.1f}", (
-                                nose[0] + 10, nose[1] + 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (
-                                255, 255, 255), 2, cv2.LINE_AA
-                        )
-
-                if shoulder_y_diff is not None and shoulder_y_avg is not None:
-                    cv2.putText(
-                        black_bg_img, f"Y Diff: {shoulder_y_diff:.1f}", (
-                            20, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,
-                                                        255, 255), 2, cv2.LINE_AA
-                    )
-                    cv2.putText(
-                        black_bg_img, f"Y Avg: {shoulder_y_avg:.1f}", (20, 60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,
-                                                        255, 255), 2, cv2.LINE_AA
-                    )
-
-            _, buffer = cv2.imencode(".jpg", black_bg_img)
-            img_b64_output = base64.b64encode(buffer).decode("utf-8")
-
-            return {
+            if engine is not None and not engine.static_image_mode:
+                engine.roi = CoreService._track_roi(
+                    frame.size, nose, left_shoulder, right_shoulder)
+
+            result = {
                 "has_angle": angle is not None,
                 "angle_value": float(angle) if angle is not None else None,
                 "neck_angle_deg": float(angle) if angle is not None else None,
                 "shoulder_y_diff_px": float(shoulder_y_diff) if shoulder_y_diff is not None else None,
                 "shoulder_y_avg_px": float(shoulder_y_avg) if shoulder_y_avg is not None else None,
-                "img": img_b64_output
+                "img": None
             }
+
+            if output == "landmarks":
+                result["landmarks"] = {
+                    "nose": list(nose) if nose else None,
+                    "left_shoulder": list(left_shoulder) if left_shoulder else None,
+                    "right_shoulder": list(right_shoulder) if right_shoulder else None,
+                }
+            elif output == "overlay":
+                # 오버레이 그리기와 JPEG 인코딩은 overlay 모드에서만 수행한다.
+                overlay = CoreService._render_overlay(
+                    (h, w), frame.region, face_results, angle, nose, left_shoulder,
+                    right_shoulder, shoulder_y_diff, shoulder_y_avg)
+                _, buffer = cv2.imencode(".jpg", overlay)
+                result["img"] = buffer.tobytes()
+
+            if gate is not None:
+                gate.update(thumb, (output, dict(result)),
+                            person=nose is not None or left_shoulder is not None)
+            return result
         except Exception as e:
-            logger.error(f"process_image_frame error: {e}", exc_info=True)
-            return {
-                "has_angle": False,
-                "angle_value": None,
-                "neck_angle_deg": None,
-                "shoulder_y_diff_px": None,
-                "shoulder_y_avg_px": None,
-                "img": img_bytes_b64
-            }
+            logger.error(f"process_image_bytes error: {e}", exc_info=True)
+            return CoreService.empty_result()
+
+    @staticmethod
+    def _ingest(img_bytes: bytes, engine: Optional[LandmarkEngine] = None) -> Optional[IngestedFrame]:
+        # 필요 이상으로 큰 JPEG 은 축소 디코딩하고, 이전 프레임에서 추적한 ROI 만 색변환해 넘긴다.
+        src_size = _jpeg_size(img_bytes)
+        np_arr = np.frombuffer(img_bytes, np.uint8)
+        img = cv2.imdecode(np_arr, _decode_flag(src_size))
+        if img is None:
+            return None
+
+        img = cv2.flip(img, 1)
+        dh, dw = img.shape[:2]
+        h, w = src_size or (dh, dw)
+        if (h > w) != (dh > dw):
+            # EXIF 회전이 적용된 경우 헤더의 가로/세로가 뒤바뀐다.
+            h, w = w, h
+        sx, sy = w / dw, h / dh
+
+        x0, y0, x1, y1 = 0, 0, dw, dh
+        roi = engine.roi if engine is not None and not engine.static_image_mode else None
+        if roi is not None:
+            cx0, cy0 = max(0, int(roi[0] / sx)), max(0, int(roi[1] / sy))
+            cx1, cy1 = min(dw, int(roi[2] / sx) + 1), min(dh, int(roi[3] / sy) + 1)
+            if cx1 - cx0 >= _MIN_ROI_SIDE and cy1 - cy0 >= _MIN_ROI_SIDE:
+                x0, y0, x1, y1 = cx0, cy0, cx1, cy1
+
+        rgb = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+        return IngestedFrame(rgb, (h, w), (x0 * sx, y0 * sy, x1 * sx, y1 * sy))
+
+    @staticmethod
+    def _track_roi(
+        size: Tuple[int, int],
+        nose: Optional[Point],
+        left_shoulder: Optional[Point],
+        right_shoulder: Optional[Point]
+    ) -> Optional[Region]:
+        # 머리/어깨 중 하나라도 놓치면 None 을 돌려 다음 프레임은 전체 프레임으로 추론한다.
+        if not settings.INGEST_ROI or not (nose and left_shoulder and right_shoulder):
+            return None
+        h, w = size
+        xs = (nose[0], left_shoulder[0], right_shoulder[0])
+        ys = (nose[1], left_shoulder[1], right_shoulder[1])
+        span = max(max(xs) - min(xs), max(ys) - min(ys), 1)
+        pad = span * settings.INGEST_ROI_MARGIN
+        x0, x1 = max(0.0, min(xs) - pad), min(float(w), max(xs) + pad)
+        y0, y1 = max(0.0, min(ys) - pad), min(float(h), max(ys) + pad)
+        if (x1 - x0) * (y1 - y0) >= 0.8 * w * h:
+            return None
+        return (x0, y0, x1, y1)
+
+    @staticmethod
+    def _render_overlay(
+        size: Tuple[int, int],
+        region: Region,
+        face_results,
+        angle: Optional[float],
+        nose: Optional[Point],
+        left_shoulder: Optional[Point],
+        right_shoulder: Optional[Point],
+        shoulder_y_diff: Optional[float],
+        shoulder_y_avg: Optional[float]
+    ) -> np.ndarray:
+        h, w = size
+        black_bg_img = np.zeros((h, w, 3), dtype=np.uint8)
+        mp_drawing = CoreService.mp_drawing
+        mp_face_mesh = CoreService.mp_face_mesh
+
+        if face_results is not None and face_results.multi_face_landmarks:
+            # FaceMesh 좌표는 크롭 영역 기준으로 정규화되어 있으므로 같은 영역의 뷰에 그린다.
+            x0, y0, x1, y1 = (int(round(v)) for v in region)
+            face_canvas = black_bg_img[y0:y1, x0:x1]
+            spec = mp_drawing.DrawingSpec(
+                color=(0, 255, 128), thickness=1, circle_radius=1)
+            for face_landmarks in face_results.multi_face_landmarks:
+                mp_drawing.draw_landmarks(
+                    image=face_canvas,
+                    landmark_list=face_landmarks,
+                    connections=mp_face_mesh.FACEMESH_CONTOURS,
+                    landmark_drawing_spec=spec,
+                    connection_drawing_spec=spec
+                )
+
+        if angle is not None:
+            cv2.circle(black_bg_img, nose, 5, (0, 255, 0), -1)
+            cv2.circle(black_bg_img, left_shoulder,
+                       5, (0, 255, 0), -1)
+            cv2.circle(black_bg_img, right_shoulder,
+                       5, (0, 255, 0), -1)
+            cv2.line(black_bg_img, left_shoulder,
+                     nose, (0, 255, 0), 2)
+            cv2.line(black_bg_img, right_shoulder,
+                     nose, (0, 255, 0), 2)
+            cv2.putText(
+                black_bg_img, f"Angle: {angle:.1f}", (
+                    nose[0] + 10, nose[1] + 20),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (
+                    255, 255, 255), 2, cv2.LINE_AA
+            )
+
+        if shoulder_y_diff is not None and shoulder_y_avg is not None:
+            cv2.putText(
+                black_bg_img, f"Y Diff: {shoulder_y_diff:.1f}", (
+                    20, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,
+                                                255, 255), 2, cv2.LINE_AA
+            )
+            cv2.putText(
+                black_bg_img, f"Y Avg: {shoulder_y_avg:.1f}", (20, 60),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,
+                                                255, 255), 2, cv2.LINE_AA
+            )
+
+        return black_bg_img
@@ -1,7 +1,135 @@
+import math
+import json
+import base64
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from ..config import settings
 from ..database.orm import Database
+from ..models.angles import AngleLog, AngleRollup
+from ..schemas.rollups import RollupBucket
+
+rollup_db = Database(AngleRollup)
+angle_db = Database(AngleLog)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _iso(ts: datetime) -> str:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.isoformat()
+
+
+def encode_cursor(logged_at: datetime, _id: ObjectId) -> str:
+    # 같은 밀리초에 여러 로그가 있을 수 있으므로 (logged_at, _id) 쌍으로 위치를 기억한다.
+    raw = f"{_iso(logged_at)}|{_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, oid = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        return datetime.fromisoformat(ts), ObjectId(oid)
+    except Exception as e:
+        raise InvalidCursor(f"잘못된 cursor 입니다: {cursor}") from e
 
 
 class DashBoard:
     @staticmethod
-    async def get_dashboard(user_id):
-        Database.get(user_id)
+    async def get_rollups(
+        user_id: int,
+        granularity: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[RollupBucket]:
+        # from 이 없으면 개수 제한에 걸렸을 때 가장 최근 구간이 남도록 최신순으로 읽은 뒤 뒤집는다.
+        newest_first = start is None
+        docs = await rollup_db.find_time_range(
+            {"user_id": user_id, "granularity": granularity},
+            start=start,
+            end=end,
+            limit=settings.DASHBOARD_MAX_ROLLUP_BUCKETS,
+            time_field="bucket",
+            newest_first=newest_first,
+            projection={"_id": 0, "user_id": 0, "granularity": 0}
+        )
+        if newest_first:
+            docs.reverse()
+        return [DashBoard._summarize(doc) for doc in docs]
+
+    @staticmethod
+    def _summarize(doc: dict) -> RollupBucket:
+        count = int(doc.get("samples") or 0)
+        mean = std = ratio = None
+        if count:
+            mean = doc["angle_sum"] / count
+            # 합/제곱합으로 분산을 복원한다. 부동소수 오차로 음수가 되는 것만 막는다.
+            std = math.sqrt(
+                max(doc["angle_sum_sq"] / count - mean * mean, 0.0))
+            ratio = doc.get("breach_count", 0) / count
+        return RollupBucket(
+            bucket=doc["bucket"],
+            count=count,
+            mean=mean,
+            std=std,
+            min=doc.get("angle_min"),
+            max=doc.get("angle_max"),
+            breach_count=int(doc.get("breach_count") or 0),
+            breach_ratio=ratio
+        )
+
+    @staticmethod
+    async def stream_history(
+        user_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 1000,
+        cursor: Optional[str] = None,
+        newest_first: bool = True
+    ) -> AsyncIterator[str]:
+        # NDJSON 한 줄에 로그 하나씩 흘려보내고, 다음 페이지가 있으면 마지막 줄에 next_cursor 를 붙인다.
+        query: dict = {"user_id": user_id}
+        time_range: dict = {}
+        if start is not None:
+            time_range["$gte"] = start
+        if end is not None:
+            time_range["$lt"] = end
+        if time_range:
+            query["logged_at"] = time_range
+        if cursor:
+            ts, oid = decode_cursor(cursor)
+            op = "$lt" if newest_first else "$gt"
+            query["$or"] = [
+                {"logged_at": {op: ts}},
+                {"logged_at": ts, "_id": {op: oid}},
+            ]
+
+        direction = -1 if newest_first else 1
+        docs = angle_db.find_cursor(
+            query,
+            projection={"user_id": 0},
+            sort=[("logged_at", direction), ("_id", direction)],
+            limit=limit + 1
+        )
+
+        sent = 0
+        last = None
+        async for doc in docs:
+            if sent == limit:
+                yield json.dumps({"next_cursor": encode_cursor(*last)}) + "\n"
+                return
+            last = (doc["logged_at"], doc["_id"])
+            sent += 1
+            yield json.dumps({
+                "angle": doc.get("angle"),
+                "shoulder_y_diff": doc.get("shoulder_y_diff"),
+                "shoulder_y_avg": doc.get("shoulder_y_avg"),
+                "breach": doc.get("breach", False),
+                "logged_at": _iso(doc["logged_at"]),
+            }, separators=(",", ":")) + "\n"
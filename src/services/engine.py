@@ -0,0 +1,192 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import mediapipe as mp
+import logging
+
+from ..config import settings
+from ..utils.gate import FrameGate
+
+logger = logging.getLogger('prod')
+
+
+# pose: Pose 하나로 코(0번)와 어깨를 모두 얻는다, face_pose: FaceMesh 코 + Pose 어깨 (기존 동작),
+# face: FaceMesh 만 사용 (어깨가 없으므로 각도는 계산되지 않는다)
+LANDMARK_BACKENDS = ("pose", "face_pose", "face")
+POSE_MODEL_COMPLEXITIES = (0, 1, 2)
+
+
+class LandmarkEngine:
+    mp_face_mesh = mp.solutions.face_mesh
+    mp_pose = mp.solutions.pose
+
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        pose_complexity: Optional[int] = None,
+        static_image_mode: bool = False
+    ):
+        self.backend = backend or settings.LANDMARK_BACKEND
+        self.pose_complexity = settings.POSE_MODEL_COMPLEXITY if pose_complexity is None else pose_complexity
+        if self.backend not in LANDMARK_BACKENDS:
+            raise ValueError(
+                f"LANDMARK_BACKEND 는 {LANDMARK_BACKENDS} 중 하나여야 합니다: {self.backend}")
+        if self.pose_complexity not in POSE_MODEL_COMPLEXITIES:
+            raise ValueError(
+                f"POSE_MODEL_COMPLEXITY 는 {POSE_MODEL_COMPLEXITIES} 중 하나여야 합니다: {self.pose_complexity}")
+
+        # 독립된 이미지를 처리하는 엔진은 프레임 간 상태(ROI 추적, 게이트)를 두지 않는다.
+        self.static_image_mode = static_image_mode
+        # 그래프 생성/모델 로딩은 여기서 한 번만 수행하고 프레임마다 재사용한다.
+        self.face_mesh = None
+        self.pose = None
+        if self.backend in ("face_pose", "face"):
+            self.face_mesh = self.mp_face_mesh.FaceMesh(
+                static_image_mode=static_image_mode, max_num_faces=1)
+        if self.backend in ("face_pose", "pose"):
+            self.pose = self.mp_pose.Pose(
+                static_image_mode=static_image_mode, model_complexity=self.pose_complexity)
+        self.lock = threading.Lock()
+        self.closed = False
+        # 이전 프레임의 머리/어깨로부터 추적한 원본 좌표계 ROI (x0, y0, x1, y1)
+        self.roi: Optional[Tuple[float, float, float, float]] = None
+        # 연속 프레임(트래킹 모드)에서만 변화 없는 프레임의 추론을 건너뛴다.
+        self.gate: Optional[FrameGate] = None
+        if settings.GATE_ENABLED and not static_image_mode:
+            self.gate = FrameGate(
+                threshold=settings.GATE_DIFF_THRESHOLD,
+                max_age=settings.GATE_MAX_REUSE_SEC,
+                absent_frames=settings.GATE_ABSENT_FRAMES,
+                probe_interval=settings.GATE_PROBE_INTERVAL_SEC,
+            )
+
+    def reset(self):
+        # 다른 세션에 넘겨주기 전에 트래킹 상태를 비운다.
+        with self.lock:
+            self.roi = None
+            if self.gate is not None:
+                self.gate.reset()
+            for graph in (self.face_mesh, self.pose):
+                if graph is not None:
+                    graph.reset()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            for graph in (self.face_mesh, self.pose):
+                if graph is not None:
+                    graph.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class EnginePool:
+    def __init__(
+        self,
+        max_sessions: int = 64,
+        max_idle: int = 4,
+        idle_ttl: float = 300.0,
+        backend: Optional[str] = None,
+        pose_complexity: Optional[int] = None
+    ):
+        self.backend = backend
+        self.pose_complexity = pose_complexity
+        self.max_sessions = max_sessions
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        self._active: "OrderedDict[str, Tuple[LandmarkEngine, float]]" = OrderedDict()
+        self._idle: List[LandmarkEngine] = []
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> LandmarkEngine:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._active.pop(session_id, None)
+            engine = entry[0] if entry else None
+            if engine is None and self._idle:
+                engine = self._idle.pop()
+
+        if engine is None:
+            logger.info(f"세션 ({session_id}) 추론 엔진 생성")
+            engine = self._new_engine()
+
+        with self._lock:
+            self._active[session_id] = (engine, now)
+            evicted = self._collect_evicted(now)
+
+        for sid, old in evicted:
+            logger.warning(f"세션 ({sid}) 추론 엔진 회수 (풀 한도 초과 또는 유휴)")
+            self._recycle(old)
+        return engine
+
+    def release(self, session_id: str):
+        with self._lock:
+            entry = self._active.pop(session_id, None)
+        if entry:
+            self._recycle(entry[0])
+
+    def warm(self, n: int):
+        # 미리 그래프를 만들어 두어 첫 프레임에서 모델 로딩 비용을 치르지 않게 한다.
+        engines = [self._new_engine() for _ in range(n)]
+        with self._lock:
+            self._idle.extend(engines)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"active": len(self._active), "idle": len(self._idle)}
+
+    def close(self):
+        with self._lock:
+            engines = [e for e, _ in self._active.values()] + self._idle
+            self._active.clear()
+            self._idle.clear()
+        for engine in engines:
+            engine.close()
+
+    def _new_engine(self) -> LandmarkEngine:
+        return LandmarkEngine(self.backend, self.pose_complexity)
+
+    def _collect_evicted(self, now: float) -> List[Tuple[str, LandmarkEngine]]:
+        evicted: List[Tuple[str, LandmarkEngine]] = []
+        while len(self._active) > self.max_sessions:
+            sid, (engine, _) = self._active.popitem(last=False)
+            evicted.append((sid, engine))
+        for sid, (engine, last_used) in list(self._active.items()):
+            if now - last_used <= self.idle_ttl:
+                break
+            del self._active[sid]
+            evicted.append((sid, engine))
+        return evicted
+
+    def _recycle(self, engine: LandmarkEngine):
+        if engine.closed:
+            return
+        with self._lock:
+            keep = len(self._idle) < self.max_idle
+        if not keep:
+            engine.close()
+            return
+        try:
+            engine.reset()
+        except Exception:
+            logger.exception("추론 엔진 초기화 실패, 폐기합니다.")
+            engine.close()
+            return
+        with self._lock:
+            self._idle.append(engine)
+
+
+engine_pool = EnginePool(
+    max_sessions=settings.ENGINE_POOL_MAX_SESSIONS,
+    max_idle=settings.ENGINE_POOL_MAX_IDLE,
+    idle_ttl=settings.ENGINE_IDLE_TTL_SEC,
+    backend=settings.LANDMARK_BACKEND,
+    pose_complexity=settings.POSE_MODEL_COMPLEXITY,
+)
@@ -0,0 +1,221 @@
+import os
+import cv2
+import time
+import zlib
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..config import settings
+from .core import DEFAULT_OUTPUT_MODE, CoreService
+from .engine import EnginePool, engine_pool
+
+logger = logging.getLogger('prod')
+
+EXECUTOR_MODES = {"process", "thread", "inline"}
+
+INFERENCE_SECONDS = Histogram(
+    "textneck_inference_seconds",
+    "프레임 추론 소요 시간 (executor 대기 포함)",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+INFERENCE_INFLIGHT = Gauge(
+    "textneck_inference_inflight", "executor 에 제출되어 완료되지 않은 프레임 수")
+INFERENCE_WORKERS = Gauge(
+    "textneck_inference_workers", "추론 executor 워커 수")
+INFERENCE_TIMEOUTS = Counter(
+    "textneck_inference_timeouts_total", "데드라인을 넘긴 프레임 수")
+INFERENCE_ERRORS = Counter(
+    "textneck_inference_errors_total", "executor 오류로 실패한 프레임 수")
+
+# 프로세스 풀 워커 안에서만 채워지는 프로세스 로컬 엔진 풀
+_process_engines: Optional[EnginePool] = None
+
+
+def _init_process(
+    max_sessions: int,
+    max_idle: int,
+    idle_ttl: float,
+    backend: str,
+    pose_complexity: int,
+    warm: int
+):
+    global _process_engines
+    try:
+        cv2.setNumThreads(1)
+    except Exception:
+        pass
+    _process_engines = EnginePool(
+        max_sessions=max_sessions,
+        max_idle=max_idle,
+        idle_ttl=idle_ttl,
+        backend=backend,
+        pose_complexity=pose_complexity,
+    )
+    if warm:
+        _process_engines.warm(warm)
+
+
+def _engines() -> EnginePool:
+    return _process_engines or engine_pool
+
+
+def _run_frame(session_id: str, payload: str | bytes, output: str) -> Dict[str, Any]:
+    engines = _engines()
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return CoreService.process_image_bytes(payload, engines.get(session_id), output)
+    return CoreService.process_image_frame(payload, engines.get(session_id), output)
+
+
+def _prepare_engine(session_id: str):
+    # 첫 프레임 전에 세션 엔진을 잡아 두어 그래프 생성 비용이 프레임 데드라인에 들어가지 않게 한다.
+    _engines().get(session_id)
+
+
+def _release_engine(session_id: str):
+    _engines().release(session_id)
+
+
+def _noop():
+    pass
+
+
+def _default_workers() -> int:
+    # 웹 워커들이 CPU 를 나눠 쓰도록 CPU 수를 웹 워커 수로 나눈다.
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return max(1, cpus // max(1, settings.WEB_CONCURRENCY))
+
+
+class InferenceExecutor:
+    def __init__(self, mode: str = "process", workers: int = 0, deadline: float = 1.0, warm: int = 1):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(
+                f"INFERENCE_EXECUTOR 는 {sorted(EXECUTOR_MODES)} 중 하나여야 합니다: {mode}")
+        self.mode = mode
+        self.workers = workers if workers > 0 else _default_workers()
+        self.deadline = deadline
+        self.warm = warm
+        self.inflight = 0
+        # process 모드: 워커 하나짜리 프로세스 풀 N 개. 세션은 해시로 한 프로세스에 고정되어
+        # 엔진(트래킹/ROI/게이트 상태)이 그 프로세스에만 생긴다.
+        self._executors: List[Executor] = []
+
+    async def start(self):
+        if self._executors or self.mode == "inline":
+            return
+        self._create()
+        if self.mode == "process":
+            # 프로세스는 첫 submit 때 뜨므로 지금 띄워 모델 로딩과 엔진 예열을 요청 경로 밖에서 끝낸다.
+            # 이벤트 루프를 막지 않고 모두 준비될 때까지 기다린다.
+            await asyncio.gather(*(
+                asyncio.wrap_future(executor.submit(_noop)) for executor in self._executors))
+        logger.info(f"추론 executor 시작: mode={self.mode} workers={self.workers}")
+
+    def _create(self):
+        if self.mode == "process":
+            ctx = multiprocessing.get_context("spawn")
+            initargs = (
+                settings.ENGINE_POOL_MAX_SESSIONS,
+                settings.ENGINE_POOL_MAX_IDLE,
+                settings.ENGINE_IDLE_TTL_SEC,
+                settings.LANDMARK_BACKEND,
+                settings.POSE_MODEL_COMPLEXITY,
+                self.warm,
+            )
+            self._executors = [
+                ProcessPoolExecutor(max_workers=1, mp_context=ctx,
+                                    initializer=_init_process, initargs=initargs)
+                for _ in range(self.workers)
+            ]
+        else:
+            self._executors = [ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="inference")]
+        INFERENCE_WORKERS.set(self.workers)
+
+    def _executor_for(self, session_id: str) -> Executor:
+        if not self._executors:
+            # start() 없이 쓰인 경우 (스크립트 등). 예열 없이 executor 만 만든다.
+            self._create()
+        if len(self._executors) == 1:
+            return self._executors[0]
+        return self._executors[zlib.crc32(session_id.encode()) % len(self._executors)]
+
+    async def prepare(self, session_id: str):
+        # 세션 시작 시 한 번. 데드라인 없이 엔진을 만들거나 유휴 엔진을 가져온다.
+        if self.mode == "inline":
+            _prepare_engine(session_id)
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor_for(session_id), _prepare_engine, session_id)
+        except Exception as e:
+            logger.error(f"세션 ({session_id}) 추론 엔진 준비 실패: {e}", exc_info=True)
+
+    async def run(
+        self,
+        session_id: str,
+        payload: str | bytes,
+        output: str = DEFAULT_OUTPUT_MODE,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        if self.mode == "inline":
+            return _run_frame(session_id, payload, output)
+        executor = self._executor_for(session_id)
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        INFERENCE_INFLIGHT.inc()
+        self.inflight += 1
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    executor, _run_frame, session_id, payload, output),
+                timeout=deadline or self.deadline,
+            )
+        except asyncio.TimeoutError:
+            INFERENCE_TIMEOUTS.inc()
+            logger.warning(f"세션 ({session_id}) 프레임 추론 데드라인 초과")
+            return {**CoreService.empty_result(), "error": "timeout"}
+        except Exception as e:
+            INFERENCE_ERRORS.inc()
+            logger.error(f"세션 ({session_id}) 프레임 추론 실패: {e}", exc_info=True)
+            return {**CoreService.empty_result(), "error": "inference_failed"}
+        finally:
+            INFERENCE_INFLIGHT.dec()
+            self.inflight -= 1
+            INFERENCE_SECONDS.observe(time.perf_counter() - started)
+
+    def utilization(self) -> float:
+        # 워커 수 대비 제출된 프레임 수. 1 을 넘으면 executor 큐에 프레임이 밀려 있다.
+        return self.inflight / self.workers
+
+    def release(self, session_id: str):
+        # 프로세스 모드에서는 세션이 고정된 프로세스에 회수를 요청한다. 밀린 프레임 뒤에 처리된다.
+        if self.mode != "process":
+            engine_pool.release(session_id)
+            return
+        try:
+            self._executor_for(session_id).submit(_release_engine, session_id)
+        except RuntimeError:
+            # 이미 종료 중인 executor
+            pass
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = []
+
+
+inference_executor = InferenceExecutor(
+    mode=settings.INFERENCE_EXECUTOR,
+    workers=settings.INFERENCE_WORKERS,
+    deadline=settings.INFERENCE_DEADLINE_SEC,
+    warm=settings.INFERENCE_WARM_ENGINES,
+)
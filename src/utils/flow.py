@@ -0,0 +1,106 @@
+import time
+from typing import Optional
+from prometheus_client import Counter
+
+# textneck 세션(..utils.flow)과 얼굴 게이트웨이(src/utils 를 sys.path 에 넣고 flat import) 가 함께 쓰는 서버 주도 프레임 속도 제어.
+# 서버가 {"type":"rate","fps":N} 으로 목표 속도를 알리고, 이를 넘겨 보내는 프레임은 디코딩 전에 버린다.
+
+RATE_UPDATES = Counter("flow_rate_updates_total", "클라이언트에 알린 목표 fps 변경", ["direction"])
+THROTTLED = Counter("flow_throttled_frames_total", "목표 fps 를 넘겨 받자마자 버린 프레임 수")
+
+
+class RateController:
+    # 세션 하나의 목표 fps 를 AIMD 로 조절한다.
+    # - 세션 지연이 target_latency 를 넘거나 추론 풀 사용률이 high_util 을 넘으면 곱으로 줄이고
+    # - 사용률이 low_util 미만이고 지연도 여유 있으면 increase 씩 늘린다.
+    # 세션은 프레임을 하나씩 처리하므로 1 / 추론 시간 이상은 보내봐야 버려진다.
+    def __init__(
+        self,
+        min_fps: float = 1.0,
+        max_fps: float = 30.0,
+        target_latency: float = 0.2,
+        interval: float = 1.0,
+        grace: float = 2.0,
+        tolerance: float = 1.25,
+        low_util: float = 0.6,
+        high_util: float = 0.9,
+        increase: float = 2.0,
+        decrease: float = 0.7,
+        alpha: float = 0.2
+    ):
+        self.min_fps = max(0.1, min_fps)
+        self.max_fps = max(self.min_fps, max_fps)
+        self.target_latency = target_latency
+        self.interval = interval
+        self.grace = grace
+        self.tolerance = tolerance
+        self.low_util = low_util
+        self.high_util = high_util
+        self.increase = increase
+        self.decrease = decrease
+        self.alpha = alpha
+        self.fps = self.max_fps
+        self.announced: Optional[int] = None
+        # 추론 시간과 수신부터 결과까지의 지연(초)의 지수 이동 평균
+        self.service = 0.0
+        self.latency = 0.0
+        self._updated_at = time.monotonic()
+        # 속도를 낮춘 직후에는 클라이언트가 따라올 때까지 이전 속도로 봐준다.
+        self._grace_fps = self.fps
+        self._grace_until = 0.0
+        self._tokens = self._burst(self.fps)
+        self._refilled_at = self._updated_at
+
+    def _burst(self, fps: float) -> float:
+        return max(2.0, fps * 0.5)
+
+    def observe(self, service: float, latency: float):
+        a = self.alpha
+        self.service = service if self.service == 0.0 else (1 - a) * self.service + a * service
+        self.latency = latency if self.latency == 0.0 else (1 - a) * self.latency + a * latency
+
+    def update(self, utilization: float, now: Optional[float] = None) -> Optional[int]:
+        # interval 마다 목표 fps 를 다시 계산한다. 클라이언트에 알릴 만큼 바뀌었으면 새 값을 돌려준다.
+        now = time.monotonic() if now is None else now
+        if now - self._updated_at < self.interval:
+            return None
+        self._updated_at = now
+
+        fps = self.fps
+        if self.latency > self.target_latency or utilization > self.high_util:
+            fps *= self.decrease
+        elif utilization < self.low_util:
+            fps += self.increase
+        if self.service > 0.0:
+            fps = min(fps, 1.0 / self.service)
+        fps = min(self.max_fps, max(self.min_fps, fps))
+
+        if fps < self.fps:
+            self._grace_fps = self.fps
+            self._grace_until = now + self.grace
+        self.fps = fps
+        return self.announce()
+
+    def announce(self) -> Optional[int]:
+        # 마지막으로 알린 값과 정수 fps 가 다를 때만 알린다.
+        fps = max(1, int(round(self.fps)))
+        if fps == self.announced:
+            return None
+        if self.announced is not None:
+            RATE_UPDATES.labels("down" if fps < self.announced else "up").inc()
+        self.announced = fps
+        return fps
+
+    def admit(self, now: Optional[float] = None) -> bool:
+        # 토큰 버킷. 목표 fps 에 tolerance 만큼 여유를 주고, 넘치는 프레임은 False.
+        now = time.monotonic() if now is None else now
+        fps = max(self.fps, self._grace_fps) if now < self._grace_until else self.fps
+        rate = fps * self.tolerance
+        burst = self._burst(rate)
+        self._tokens = min(burst, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        THROTTLED.inc()
+        return False
@@ -0,0 +1,63 @@
+import time
+from typing import Any, Optional, Tuple
+import cv2
+import numpy as np
+
+# CoreService(..utils.gate) 와 얼굴 게이트웨이 워커(src/utils 를 sys.path 에 넣고 flat import) 가 함께 쓰므로
+# numpy/cv2 외 의존성을 두지 않는다.
+
+THUMB_SIZE = (32, 24)
+
+
+def thumbnail(img_bytes) -> Optional[np.ndarray]:
+    # JPEG 을 1/8 축소 그레이스케일로 디코딩하면 전체 디코딩보다 훨씬 싸다.
+    gray = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        return None
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+class FrameGate:
+    # 세션 하나의 추론 생략 여부를 판단한다.
+    # - 마지막으로 추론한 프레임과 썸네일 차이가 threshold 미만이면 그 결과를 max_age 동안 재사용한다.
+    #   직전 프레임이 아닌 "추론한 프레임"과 비교해야 천천히 변하는 장면에서 변화가 누적되어도 놓치지 않는다.
+    # - absent_frames 번 연속으로 사람이 없으면 probe_interval 마다 한 번만 추론한다.
+    def __init__(
+        self,
+        threshold: float = 0.02,
+        max_age: float = 1.0,
+        absent_frames: int = 15,
+        probe_interval: float = 1.0
+    ):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.absent_frames = absent_frames
+        self.probe_interval = probe_interval
+        self.reset()
+
+    def reset(self):
+        self._ref: Optional[np.ndarray] = None
+        self._result: Any = None
+        self._inferred_at = 0.0
+        self._absent = 0
+
+    def check(self, thumb: Optional[np.ndarray], now: Optional[float] = None) -> Tuple[bool, Any]:
+        # (재사용 여부, 재사용할 결과)
+        if thumb is None or self._ref is None or thumb.shape != self._ref.shape:
+            return False, None
+        now = time.monotonic() if now is None else now
+        age = now - self._inferred_at
+        if self._absent >= self.absent_frames:
+            return age < self.probe_interval, self._result
+        if age >= self.max_age:
+            return False, None
+        diff = float(cv2.absdiff(thumb, self._ref).mean()) / 255.0
+        return diff < self.threshold, self._result
+
+    def update(self, thumb: Optional[np.ndarray], result: Any, person: bool, now: Optional[float] = None):
+        if thumb is None:
+            return
+        self._ref = thumb
+        self._result = result
+        self._inferred_at = time.monotonic() if now is None else now
+        self._absent = 0 if person else self._absent + 1
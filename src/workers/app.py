@@ -1,41 +1,95 @@
 import os
+import sys
 import json
-import base64
+import time
+import uuid
 import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from prometheus_client import make_asgi_app
 from worker_pool import WorkerPool
+from autoscaler import Autoscaler
+from protocol import DEFAULT_FORMAT, FORMATS
+
+# 메인 앱과 함께 쓰는 모듈(src/utils). 뒤에 붙여 src/utils/logging.py 가 표준 logging 을 가리지 않게 한다.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from flow import RateController  # noqa: E402
 
 os.environ.setdefault("OMP_NUM_THREADS", "1")
 os.environ.setdefault("MKL_NUM_THREADS", "1")
 
-app = FastAPI()
 POOL: WorkerPool | None = None
+WORKER_COUNT = int(os.environ.get("WORKER_COUNT", str(max(1, (os.cpu_count() or 2) - 1))))
+# WORKER_MAX 가 WORKER_MIN 보다 크면 부하에 따라 워커 수를 늘리고 줄인다.
+WORKER_MIN = int(os.environ.get("WORKER_MIN", str(WORKER_COUNT)))
+WORKER_MAX = int(os.environ.get("WORKER_MAX", str(WORKER_COUNT)))
+# 서버 주도 프레임 속도 제어. {"type":"rate","fps":N} 을 보내고 넘치는 프레임은 버린다.
+# config 에 "rate": true 를 보낸 클라이언트에만 적용한다.
+FLOW_ENABLED = os.environ.get("FLOW_ENABLED", "true").lower() not in ("0", "false", "no")
+FLOW_MIN_FPS = float(os.environ.get("FLOW_MIN_FPS", "1.0"))
+FLOW_MAX_FPS = float(os.environ.get("FLOW_MAX_FPS", "30.0"))
+FLOW_TARGET_LATENCY = float(os.environ.get("FLOW_TARGET_LATENCY_SEC", "0.2"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global POOL
+    POOL = WorkerPool(WORKER_COUNT)
+    await POOL.start()
+    autoscaler = Autoscaler(POOL, min_workers=WORKER_MIN, max_workers=WORKER_MAX)
+    autoscaler.start()
+    yield
+    autoscaler.stop()
+    await POOL.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+app.mount("/metrics", make_asgi_app())
 
 
 class Session:
     def __init__(self, ws: WebSocket):
         self.ws = ws
+        self.session_id = uuid.uuid4().hex
         self.q = asyncio.Queue(maxsize=1)
         self.expect_gray = False
+        # 랜드마크 결과 포맷. f32/i16 은 바이너리 프레임, json 은 기존 텍스트 프레임
+        self.format = DEFAULT_FORMAT
         self.running = True
         self.inflight = False
+        self.flow: RateController | None = None
 
     async def recv_loop(self):
         while self.running:
             msg = await self.ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(msg.get("code", 1000))
             if (b := msg.get("bytes")) is not None:
+                if self.flow is not None and not self.flow.admit():
+                    continue
                 if self.q.full():
                     try:
                         _ = self.q.get_nowait()
                         self.q.task_done()
                     except asyncio.QueueEmpty:
                         pass
-                await self.q.put(b)
+                await self.q.put((time.monotonic(), b))
             elif (t := msg.get("text")) is not None:
                 try:
                     obj = json.loads(t)
                     if obj.get("type") == "config":
                         self.expect_gray = bool(obj.get("gray", False))
+                        if obj.get("format") in FORMATS:
+                            self.format = obj["format"]
+                        if FLOW_ENABLED and obj.get("rate") is True:
+                            self.flow = self.flow or RateController(
+                                min_fps=FLOW_MIN_FPS, max_fps=FLOW_MAX_FPS, target_latency=FLOW_TARGET_LATENCY)
+                        else:
+                            self.flow = None
+                        if self.flow is not None:
+                            # 설정을 받으면 현재 목표 fps 를 바로 알린다.
+                            self.flow.announce()
+                            await self.send_rate(self.flow.announced)
                     elif obj.get("type") == "ping":
                         await self.ws.send_text('{"type":"pong"}')
                 except Exception:
@@ -43,23 +97,34 @@ class Session:
 
     async def infer_loop(self):
         while self.running:
-            frame = await self.q.get()
+            received_at, frame = await self.q.get()
             if self.inflight:
 
                 self.q.task_done()
                 continue
             self.inflight = True
             try:
-                worker = POOL.pick()
-                b64 = base64.b64encode(frame).decode("ascii")
-                res = await worker.ask(b64, self.expect_gray, timeout=0.5)
-                await self.ws.send_text(json.dumps({"type": "landmarks", **res}))
+                started = time.monotonic()
+                res = await POOL.ask(frame, self.expect_gray, timeout=0.5,
+                                     fmt=self.format, session_id=self.session_id)
+                if self.flow is not None:
+                    now = time.monotonic()
+                    self.flow.observe(now - started, now - received_at)
+                if (data := res.get("data")) is not None:
+                    await self.ws.send_bytes(data)
+                else:
+                    await self.ws.send_text(json.dumps({"type": "landmarks", **res}))
+                if self.flow is not None and (fps := self.flow.update(POOL.utilization())) is not None:
+                    await self.send_rate(fps)
             except Exception as e:
                 await self.ws.send_text(json.dumps({"type": "landmarks", "ok": False, "error": str(e)[:200]}))
             finally:
                 self.inflight = False
                 self.q.task_done()
 
+    async def send_rate(self, fps: int):
+        await self.ws.send_text(json.dumps({"type": "rate", "fps": fps}))
+
 
 @app.websocket("/ws/face")
 async def ws_face(ws: WebSocket):
@@ -68,11 +133,24 @@ async def ws_face(ws: WebSocket):
     t1 = asyncio.create_task(sess.recv_loop())
     t2 = asyncio.create_task(sess.infer_loop())
     try:
-        await asyncio.gather(t1, t2)
+        # 한쪽이 끝나면(보통 연결 종료로 recv_loop) 큐에서 기다리는 다른 쪽을 취소해 태스크가 남지 않게 한다.
+        done, pending = await asyncio.wait({t1, t2}, return_when=asyncio.FIRST_COMPLETED)
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for t in done:
+            t.result()
     except WebSocketDisconnect:
         pass
     finally:
         sess.running = False
+        # 핸들러 자체가 취소된 경우(서버 종료 등)에도 두 태스크를 남기지 않는다.
+        for t in (t1, t2):
+            if not t.done():
+                t.cancel()
+            elif not t.cancelled():
+                t.exception()
+        POOL.release(sess.session_id)
         try:
             await ws.close()
         except Exception:
@@ -0,0 +1,149 @@
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Optional, Tuple
+import numpy as np
+from prometheus_client import Counter, Gauge
+from worker_pool import WorkerPool
+
+logger = logging.getLogger('prod')
+
+INTERVAL = float(os.environ.get("WORKER_AUTOSCALE_INTERVAL_SEC", "5.0"))
+WINDOW = float(os.environ.get("WORKER_AUTOSCALE_WINDOW_SEC", "30.0"))
+# 늘릴 때는 빨리, 줄일 때는 천천히. 줄인 직후 다시 늘리는 진동을 막는다.
+UP_COOLDOWN = float(os.environ.get("WORKER_AUTOSCALE_UP_COOLDOWN_SEC", "15.0"))
+DOWN_COOLDOWN = float(os.environ.get("WORKER_AUTOSCALE_DOWN_COOLDOWN_SEC", "120.0"))
+
+DECISIONS = Counter("worker_autoscaler_decisions_total", "오토스케일러 결정", ["action", "reason"])
+TARGET = Gauge("worker_autoscaler_workers", "현재 풀 크기")
+SIGNAL_OUTSTANDING = Gauge("worker_autoscaler_outstanding_per_worker", "워커당 평균 대기 요청 수")
+SIGNAL_P95 = Gauge("worker_autoscaler_p95_seconds", "최근 요청 p95 지연")
+SIGNAL_TIMEOUT_RATE = Gauge("worker_autoscaler_timeout_ratio", "최근 요청 중 타임아웃 비율")
+
+
+class Autoscaler:
+    def __init__(
+        self,
+        pool: WorkerPool,
+        min_workers: int,
+        max_workers: int,
+        interval: float = INTERVAL,
+        window: float = WINDOW,
+        up_cooldown: float = UP_COOLDOWN,
+        down_cooldown: float = DOWN_COOLDOWN,
+        up_outstanding: float = 0.75,
+        down_outstanding: float = 0.2,
+        up_p95: float = 0.25,
+        down_p95: float = 0.1,
+        up_timeout_rate: float = 0.02
+    ):
+        self.pool = pool
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.interval = interval
+        self.window = window
+        self.up_cooldown = up_cooldown
+        self.down_cooldown = down_cooldown
+        # 워커당 대기 요청 수 기준은 워커 inflight 한도에 대한 비율이다.
+        self.up_outstanding = up_outstanding
+        self.down_outstanding = down_outstanding
+        self.up_p95 = up_p95
+        self.down_p95 = down_p95
+        self.up_timeout_rate = up_timeout_rate
+        self._load: Deque[Tuple[float, float]] = deque()
+        self._last_up = 0.0
+        self._last_change = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > self.min_workers
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._last_change = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.step()
+            except Exception:
+                logger.exception("오토스케일러 루프 오류")
+
+    def signals(self) -> Tuple[float, float, float]:
+        # (워커당 평균 대기 요청 / inflight 한도, p95 지연, 타임아웃 비율)
+        now = time.monotonic()
+        n = max(1, len(self.pool.workers))
+        self._load.append((now, self.pool.outstanding() / n))
+        while self._load and self._load[0][0] < now - self.window:
+            self._load.popleft()
+        load = float(np.mean([v for _, v in self._load])) / max(1, self.pool.max_inflight)
+
+        latencies, timeouts = self.pool.recent(self.window)
+        p95 = float(np.percentile(latencies, 95)) if latencies else 0.0
+        timeout_rate = timeouts / len(latencies) if latencies else 0.0
+
+        SIGNAL_OUTSTANDING.set(load * self.pool.max_inflight)
+        SIGNAL_P95.set(p95)
+        SIGNAL_TIMEOUT_RATE.set(timeout_rate)
+        return load, p95, timeout_rate
+
+    def decide(self, load: float, p95: float, timeout_rate: float) -> Tuple[str, str]:
+        n = len(self.pool.workers)
+        now = time.monotonic()
+        if n < self.min_workers:
+            return "up", "below_min"
+        if n > self.max_workers:
+            return "down", "above_max"
+
+        reason = None
+        if timeout_rate > self.up_timeout_rate:
+            reason = "timeouts"
+        elif p95 > self.up_p95:
+            reason = "latency"
+        elif load > self.up_outstanding:
+            reason = "outstanding"
+        if reason is not None:
+            if n >= self.max_workers:
+                return "hold", "at_max"
+            if now - self._last_up < self.up_cooldown:
+                return "hold", "cooldown"
+            return "up", reason
+
+        idle = load < self.down_outstanding and p95 < self.down_p95 and timeout_rate == 0.0
+        if idle and n > self.min_workers:
+            if now - self._last_change < self.down_cooldown:
+                return "hold", "cooldown"
+            return "down", "idle"
+        return "hold", "steady"
+
+    async def step(self) -> str:
+        load, p95, timeout_rate = self.signals()
+        action, reason = self.decide(load, p95, timeout_rate)
+        DECISIONS.labels(action, reason).inc()
+
+        if action == "up":
+            w = await self.pool.add_worker()
+            if w is None:
+                action = "hold"
+            else:
+                self._last_up = self._last_change = time.monotonic()
+                logger.info(f"워커 {w.name} 추가 ({reason}): {len(self.pool.workers)}개, "
+                            f"load={load:.2f} p95={p95 * 1000:.0f}ms timeouts={timeout_rate:.1%}")
+        elif action == "down":
+            self._last_change = time.monotonic()
+            name = await self.pool.drain_worker()
+            if name is not None:
+                logger.info(f"워커 {name} 드레인 후 종료 ({reason}): {len(self.pool.workers)}개")
+        TARGET.set(len(self.pool.workers))
+        return action
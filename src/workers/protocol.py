@@ -0,0 +1,42 @@
+
+import struct
+import numpy as np
+
+# 랜드마크 결과 바이너리 포맷: 8바이트 헤더 + little-endian 배열
+#   magic(2s) version(B) dtype(B) n(H) dims(B) pad(x)
+LANDMARK_MAGIC = b"LM"
+LANDMARK_VERSION = 1
+LANDMARK_HEADER = struct.Struct("!2sBBHBx")
+
+FORMATS = ("f32", "i16", "json")
+DEFAULT_FORMAT = "f32"
+
+# int16 은 정규화 좌표에 1e4 를 곱해 담는다 (소수 4자리, 기존 JSON 의 round(x, 4) 와 같은 정밀도)
+I16_SCALE = 1e4
+_DTYPES = {"f32": (1, np.dtype("<f4")), "i16": (2, np.dtype("<i2"))}
+_CODES = {code: (fmt, dt) for fmt, (code, dt) in _DTYPES.items()}
+
+
+def pack_landmarks(points: np.ndarray, fmt: str = DEFAULT_FORMAT) -> bytes:
+    code, dt = _DTYPES[fmt]
+    points = np.asarray(points, dtype=np.float32)
+    if points.ndim != 2:
+        points = points.reshape(-1, 3)
+    n, dims = points.shape
+    if fmt == "i16":
+        data = np.clip(np.rint(points * I16_SCALE), -32768, 32767).astype(dt)
+    else:
+        data = points.astype(dt, copy=False)
+    return LANDMARK_HEADER.pack(LANDMARK_MAGIC, LANDMARK_VERSION, code, n, dims) + data.tobytes()
+
+
+def unpack_landmarks(buf: bytes | memoryview) -> np.ndarray:
+    magic, version, code, n, dims = LANDMARK_HEADER.unpack_from(buf)
+    if magic != LANDMARK_MAGIC or version != LANDMARK_VERSION or code not in _CODES:
+        raise ValueError("unknown landmark frame")
+    fmt, dt = _CODES[code]
+    arr = np.frombuffer(buf, dtype=dt, count=n * dims,
+                        offset=LANDMARK_HEADER.size).reshape(n, dims)
+    if fmt == "i16":
+        return arr.astype(np.float32) / I16_SCALE
+    return arr
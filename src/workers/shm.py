@@ -0,0 +1,77 @@
+
+from typing import List, Optional
+from multiprocessing import shared_memory, resource_tracker
+
+
+class ShmRing:
+    # 워커 하나당 하나씩 두는 공유 메모리 프레임 슬롯 묶음.
+    # 게이트웨이가 빈 슬롯에 JPEG 바이트를 쓰고 파이프로는 (slot, len, id) 만 보낸다.
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, slot_size: int, owner: bool):
+        self.shm = shm
+        self.slots = slots
+        self.slot_size = slot_size
+        self.owner = owner
+        self._free: List[bool] = [True] * slots
+        self._cursor = 0
+
+    @classmethod
+    def create(cls, slots: int, slot_size: int) -> "ShmRing":
+        shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        return cls(shm, slots, slot_size, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slot_size: int) -> "ShmRing":
+        shm = shared_memory.SharedMemory(name=name)
+        # 3.12 의 resource_tracker 는 attach 한 쪽이 종료될 때도 세그먼트를 unlink 해버린다.
+        # 세그먼트의 수명은 게이트웨이(owner)가 관리하므로 워커 쪽 추적은 해제한다.
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, slots, slot_size, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def acquire(self) -> Optional[int]:
+        # 이벤트 루프 한 곳에서만 부르므로 락이 필요 없다.
+        for i in range(self.slots):
+            slot = (self._cursor + i) % self.slots
+            if self._free[slot]:
+                self._free[slot] = False
+                self._cursor = slot + 1
+                return slot
+        return None
+
+    def release(self, slot: int):
+        self._free[slot] = True
+
+    def release_all(self):
+        self._free = [True] * self.slots
+
+    def fits(self, length: int) -> bool:
+        return length <= self.slot_size
+
+    def write(self, slot: int, data: bytes | memoryview) -> int:
+        off = slot * self.slot_size
+        n = len(data)
+        self.shm.buf[off:off + n] = data
+        return n
+
+    def view(self, slot: int, length: int) -> memoryview:
+        # 복사 없이 슬롯 내용을 가리키는 memoryview. 다음 요청 전에 다 써야 한다.
+        off = slot * self.slot_size
+        return self.shm.buf[off:off + length]
+
+    def close(self):
+        try:
+            self.shm.close()
+        except BufferError:
+            # 아직 살아있는 view 가 있으면 프로세스 종료 시 정리된다.
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -3,10 +3,19 @@ import os
 import sys
 import json
 import base64
+import argparse
 import traceback
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 import numpy as np
 import cv2
 import mediapipe as mp
+from shm import ShmRing
+from protocol import DEFAULT_FORMAT, pack_landmarks
+
+# 메인 앱과 함께 쓰는 모듈(src/utils). 뒤에 붙여 src/utils/logging.py 가 표준 logging 을 가리지 않게 한다.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from gate import FrameGate, thumbnail  # noqa: E402
 
 
 os.environ.setdefault("OMP_NUM_THREADS", "1")
@@ -18,42 +27,153 @@ except Exception:
 
 
 mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    static_image_mode=False,
-    max_num_faces=1,
-    refine_landmarks=False,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5,
-)
+
+
+def new_face_mesh():
+    return mp_face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=1,
+        refine_landmarks=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+    )
+
+
+# 세션 id 가 없는 요청이 쓰는 그래프
+face_mesh = new_face_mesh()
+
+# 세션별 FaceMesh. 세션이 번갈아 들어와도 서로의 얼굴 추적을 깨지 않게 세션마다 그래프를 따로 둔다.
+# 그래프 하나가 ~18MB 이므로 개수를 제한하고, 넘치면 가장 오래 안 쓴 세션의 그래프를 리셋해 재사용한다.
+MESH_MAX_SESSIONS = int(os.environ.get("WORKER_MESH_MAX_SESSIONS", "8"))
+meshes: "OrderedDict[str, mp_face_mesh.FaceMesh]" = OrderedDict()
+
+# 새 세션의 그래프 생성(~35ms)이 그 세션과 뒤에 밀린 다른 세션 프레임을 막지 않도록
+# 빌더 스레드가 예비 그래프 하나를 미리 만들어 둔다.
+_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mesh-builder")
+_spare: Future | None = _builder.submit(new_face_mesh)
+
+
+def _take_spare_mesh():
+    global _spare
+    fut, _spare = _spare, None
+    mesh = fut.result() if fut is not None else new_face_mesh()
+    if len(meshes) + 1 < MESH_MAX_SESSIONS:
+        _spare = _builder.submit(new_face_mesh)
+    return mesh
+
+
+def mesh_for(sid: str | None, reset: bool = False):
+    if not sid:
+        if reset:
+            face_mesh.reset()
+        return face_mesh
+    mesh = meshes.pop(sid, None)
+    if mesh is None:
+        if len(meshes) >= max(1, MESH_MAX_SESSIONS):
+            _, mesh = meshes.popitem(last=False)
+            mesh.reset()
+        else:
+            mesh = _take_spare_mesh()
+    elif reset:
+        mesh.reset()
+    meshes[sid] = mesh
+    return mesh
+
+# 세션별 프레임 변화 게이트. 세션이 이 워커에 고정되므로 워커 안에서 세션 id 로 보관한다.
+GATE_ENABLED = os.environ.get("GATE_ENABLED", "true").lower() not in ("0", "false", "no")
+GATE_MAX_SESSIONS = 64
+gates: "OrderedDict[str, FrameGate]" = OrderedDict()
+
+
+def gate_for(sid: str | None) -> FrameGate | None:
+    if not GATE_ENABLED or not sid:
+        return None
+    gate = gates.pop(sid, None)
+    if gate is None:
+        gate = FrameGate(
+            threshold=float(os.environ.get("GATE_DIFF_THRESHOLD", "0.02")),
+            max_age=float(os.environ.get("GATE_MAX_REUSE_SEC", "1.0")),
+            absent_frames=int(os.environ.get("GATE_ABSENT_FRAMES", "15")),
+            probe_interval=float(os.environ.get("GATE_PROBE_INTERVAL_SEC", "1.0")),
+        )
+    gates[sid] = gate
+    while len(gates) > GATE_MAX_SESSIONS:
+        gates.popitem(last=False)
+    return gate
+
+
+# 게이트웨이가 --shm 으로 공유 메모리를 넘겨주면 프레임을 파이프 대신 여기서 읽는다.
+ring: ShmRing | None = None
+
+
+def read_frame(req: dict) -> np.ndarray:
+    if ring is not None and "slot" in req:
+        return np.frombuffer(ring.view(int(req["slot"]), int(req["len"])), np.uint8)
+    return np.frombuffer(base64.b64decode(req["image_b64"]), np.uint8)
 
 
 def process_one(req: dict) -> dict:
     fid = req.get("id")
     try:
-        buf = np.frombuffer(base64.b64decode(req["image_b64"]), np.uint8)
-        bgr = cv2.imdecode(buf, cv2.IMREAD_COLOR)
-        if bgr is None:
-            return {"id": fid, "ok": False, "error": "decode_failed"}
+        # reset 은 세션이 이 워커에 새로 묶였을 때만 온다. 그 세션의 추적 상태만 버린다.
+        sid = req.get("sid")
+        reset = bool(req.get("reset"))
+        mesh = mesh_for(sid, reset)
+
+        frame = read_frame(req)
+        gate = gate_for(sid)
+        if gate is not None and reset:
+            gate.reset()
+        thumb = thumbnail(frame) if gate is not None else None
+        cached, pts = gate.check(thumb) if gate is not None else (False, None)
+        if not cached or pts is None:
+            bgr = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+            if bgr is None:
+                return {"id": fid, "ok": False, "error": "decode_failed"}
 
-        if req.get("gray"):
-            g = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-            bgr = cv2.cvtColor(g, cv2.COLOR_GRAY2BGR)
+            if req.get("gray"):
+                g = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+                bgr = cv2.cvtColor(g, cv2.COLOR_GRAY2BGR)
 
-        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-        res = face_mesh.process(rgb)
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            res = mesh.process(rgb)
 
-        pts = []
-        if res.multi_face_landmarks:
-            lm = res.multi_face_landmarks[0]
-            for p in lm.landmark:
-                pts.append([round(p.x, 4), round(p.y, 4), round(p.z, 4)])
+            pts = np.empty((0, 3), np.float32)
+            if res.multi_face_landmarks:
+                lm = res.multi_face_landmarks[0].landmark
+                pts = np.array([(p.x, p.y, p.z) for p in lm], np.float32)
+            cached = False
+            if gate is not None:
+                gate.update(thumb, pts, person=len(pts) > 0)
 
-        return {"id": fid, "ok": True, "n": len(pts), "points": pts}
+        fmt = req.get("format", DEFAULT_FORMAT)
+        if fmt == "json":
+            return {"id": fid, "ok": True, "n": len(pts), "cached": cached,
+                    "points": np.round(pts, 4).tolist()}
+
+        data = pack_landmarks(pts, fmt)
+        out = {"id": fid, "ok": True, "n": len(pts), "format": fmt, "cached": cached}
+        if ring is not None and "slot" in req and ring.fits(len(data)):
+            # 입력 JPEG 은 이미 디코드했으므로 같은 슬롯에 결과를 덮어쓴다.
+            out["slot"] = int(req["slot"])
+            out["len"] = ring.write(out["slot"], data)
+        else:
+            out["data_b64"] = base64.b64encode(data).decode("ascii")
+        return out
     except Exception:
         return {"id": fid, "ok": False, "error": "exception", "trace": traceback.format_exc()[:800]}
 
 
 def main():
+    global ring
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shm")
+    parser.add_argument("--shm-slots", type=int, default=0)
+    parser.add_argument("--shm-slot-size", type=int, default=0)
+    args = parser.parse_args()
+    if args.shm:
+        ring = ShmRing.attach(args.shm, args.shm_slots, args.shm_slot_size)
+
     for line in sys.stdin:
         line = line.strip()
         if not line:
@@ -61,7 +181,7 @@ def main():
         try:
             req = json.loads(line)
             if req.get("type") == "ping":
-                print(json.dumps({"type": "pong"}), flush=True)
+                print(json.dumps({"type": "pong", "id": req.get("id")}), flush=True)
                 continue
             resp = process_one(req)
         except Exception:
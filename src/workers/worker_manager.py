@@ -1,88 +1,224 @@
 
 import json
+import time
 import uuid
+import base64
 import asyncio
-import threading
-import subprocess
-from typing import Dict, List, Optional
+import logging
+from typing import Dict, List, Optional, Set
+from shm import ShmRing
+from protocol import DEFAULT_FORMAT
+
+logger = logging.getLogger('prod')
+
+# 워커 stdout 한 줄 최대 길이. json 포맷 랜드마크나 트레이스백도 한 줄에 들어와야 한다.
+STREAM_LIMIT = 1 << 20
+# terminate 후 이 시간 안에 끝나지 않으면 kill 한다.
+STOP_TIMEOUT = 3.0
 
 
 class PopenWorker:
-    def __init__(self, cmd: List[str], env: Optional[dict] = None):
-        self.proc = subprocess.Popen(
-            cmd,
-            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            text=True, bufsize=1, close_fds=True, start_new_session=True, env=env
-        )
-        self.lock = threading.Lock()
+    def __init__(self, proc: asyncio.subprocess.Process, ring: Optional[ShmRing] = None, name: str = "0"):
+        # 직접 만들지 말고 await PopenWorker.spawn(...) 을 사용한다.
+        self.name = name
+        self.proc = proc
+        self.ring = ring
+        # 요청 id -> 사용 중인 슬롯. 타임아웃이 나도 워커가 답할 때까지 슬롯을 비우지 않는다.
+        self.slots: Dict[str, int] = {}
         self.pending: Dict[str, asyncio.Future] = {}
-        self._stop = threading.Event()
-        self.t_out = threading.Thread(target=self._read_stdout, daemon=True)
-        self.t_err = threading.Thread(target=self._drain_stderr, daemon=True)
-        self.t_out.start()
-        self.t_err.start()
-
-    def _read_stdout(self):
-        while not self._stop.is_set():
-            line = self.proc.stdout.readline()
-            if not line:
-                if self.proc.poll() is not None:
-                    for fid, fut in list(self.pending.items()):
-                        if not fut.done():
-                            fut.set_result(
-                                {"id": fid, "ok": False, "error": "worker_exited"})
-                    self.pending.clear()
-                    break
+        # 워커에 보냈지만 아직 답이 오지 않은 요청 id. 타임아웃된 요청도 워커가 답할 때까지 남는다.
+        self.outstanding: Set[str] = set()
+        # 최근 응답 지연의 지수 이동 평균(초). 스케줄러가 사용한다.
+        self.ewma = 0.0
+        # 첫 pong 을 받으면 True. 그 전까지는 모델을 올리는 중이다.
+        self.ready = False
+        self.started_at = time.monotonic()
+        # 스레드 없이 이벤트 루프에서 stdout/stderr 를 읽는다.
+        self._reader = asyncio.create_task(self._read_stdout())
+        self._stderr = asyncio.create_task(self._drain_stderr())
+
+    @classmethod
+    async def spawn(
+        cls,
+        cmd: List[str],
+        env: Optional[dict] = None,
+        shm_slots: int = 0,
+        shm_slot_size: int = 0,
+        name: str = "0"
+    ) -> "PopenWorker":
+        # shm_slots > 0 이면 프레임은 공유 메모리 슬롯으로, 파이프에는 제어 메시지만 보낸다.
+        ring: Optional[ShmRing] = None
+        if shm_slots > 0 and shm_slot_size > 0:
+            ring = ShmRing.create(shm_slots, shm_slot_size)
+            cmd = cmd + ["--shm", ring.name,
+                         "--shm-slots", str(shm_slots),
+                         "--shm-slot-size", str(shm_slot_size)]
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                close_fds=True, start_new_session=True, env=env, limit=STREAM_LIMIT
+            )
+        except Exception:
+            if ring is not None:
+                ring.close()
+            raise
+        return cls(proc, ring, name)
+
+    async def _read_stdout(self):
+        while True:
+            try:
+                line = await self.proc.stdout.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                logger.warning(f"[worker {self.name}] 너무 긴 응답 줄을 버립니다.")
                 continue
+            if not line:
+                break
             try:
-                msg = json.loads(line.strip())
+                msg = json.loads(line)
                 fid = msg.get("id")
-                if fid and fid in self.pending:
-                    fut = self.pending.pop(fid)
-                    if not fut.done():
-                        fut.set_result(msg)
+                self.outstanding.discard(fid)
+                slot = self.slots.pop(fid, None)
+                if slot is not None:
+                    # 워커가 결과를 슬롯에 써 돌려줬으면 슬롯을 비우기 전에 복사해 둔다.
+                    if msg.get("slot") == slot and "len" in msg:
+                        msg["data"] = bytes(self.ring.view(slot, int(msg.pop("len"))))
+                        del msg["slot"]
+                    self.ring.release(slot)
+                if "data_b64" in msg:
+                    msg["data"] = base64.b64decode(msg.pop("data_b64"))
+                fut = self.pending.pop(fid, None) if fid else None
+                if fut is not None and not fut.done():
+                    fut.set_result(msg)
             except Exception:
                 pass
 
-    def _drain_stderr(self):
-        for _ in self.proc.stderr:
-            pass
-        # TODO: 로깅 시스템에 연결
+        # stdout EOF = 워커 종료. 기다리던 요청을 모두 실패로 끝낸다.
+        self.slots.clear()
+        self.outstanding.clear()
+        if self.ring is not None:
+            self.ring.release_all()
+        for fid, fut in list(self.pending.items()):
+            if not fut.done():
+                fut.set_result({"id": fid, "ok": False, "error": "worker_exited"})
+        self.pending.clear()
+
+    async def _drain_stderr(self):
+        # 워커의 stderr (MediaPipe/TFLite 로그, 트레이스백) 를 게이트웨이 로그로 보낸다.
+        while True:
+            try:
+                line = await self.proc.stderr.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                continue
+            if not line:
+                break
+            line = line.decode("utf-8", "replace").rstrip()
+            if line:
+                logger.info(f"[worker {self.name}] {line}")
+
+    def _send(self, msg: dict):
+        # write 는 한 줄을 통째로 전송 버퍼에 넣으므로 요청끼리 섞이지 않는다. 락이 필요 없다.
+        self.proc.stdin.write(json.dumps(msg).encode() + b"\n")
+
+    async def _reply(self, fut: asyncio.Future) -> dict:
+        await self.proc.stdin.drain()
+        return await fut
 
-    async def ask(self, image_b64: str, expect_gray: bool, timeout: float = 0.5) -> dict:
+    async def ping(self, timeout: float = 2.0) -> bool:
+        # 워커가 stdin 을 읽고 답할 수 있는지 확인한다. 프레임 요청 뒤에 줄을 서므로 밀려 있으면 늦게 온다.
         fid = uuid.uuid4().hex
-        loop = asyncio.get_running_loop()
-        fut = loop.create_future()
+        fut = asyncio.get_running_loop().create_future()
         self.pending[fid] = fut
-
-        req = {"id": fid, "image_b64": image_b64, "gray": expect_gray}
-        payload = json.dumps(req) + "\n"
         try:
-            with self.lock:
-                self.proc.stdin.write(payload)
-                self.proc.stdin.flush()
+            self._send({"type": "ping", "id": fid})
+            msg = await asyncio.wait_for(self._reply(fut), timeout=timeout)
+            ok = msg.get("type") == "pong"
+            self.ready = self.ready or ok
+            return ok
         except Exception:
-            if fid in self.pending and not self.pending[fid].done():
-                self.pending[fid].set_result(
-                    {"id": fid, "ok": False, "error": "write_failed"})
-            return await fut
+            return False
+        finally:
+            self.pending.pop(fid, None)
+
+    async def ask(
+        self,
+        frame: bytes,
+        expect_gray: bool,
+        timeout: float = 0.5,
+        fmt: str = DEFAULT_FORMAT,
+        reset: bool = False,
+        sid: Optional[str] = None
+    ) -> dict:
+        fid = uuid.uuid4().hex
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[fid] = fut
+
+        req = {"id": fid, "gray": expect_gray, "format": fmt}
+        if reset:
+            req["reset"] = True
+        if sid:
+            req["sid"] = sid
+        slot = None
+        if self.ring is not None and self.ring.fits(len(frame)):
+            slot = self.ring.acquire()
+        if slot is not None:
+            req["slot"] = slot
+            req["len"] = self.ring.write(slot, frame)
+            self.slots[fid] = slot
+        else:
+            # 공유 메모리를 쓰지 않거나 슬롯이 없으면 기존처럼 base64 로 보낸다.
+            req["image_b64"] = base64.b64encode(frame).decode("ascii")
+        self.outstanding.add(fid)
 
         try:
-            return await asyncio.wait_for(fut, timeout=timeout)
-        except asyncio.TimeoutError:
-            if fid in self.pending and not self.pending[fid].done():
-                self.pending[fid].set_result(
-                    {"id": fid, "ok": False, "error": "timeout"})
-                self.pending.pop(fid, None)
-            return {"id": fid, "ok": False, "error": "timeout"}
+            try:
+                self._send(req)
+            except Exception:
+                self.outstanding.discard(fid)
+                if (slot := self.slots.pop(fid, None)) is not None:
+                    self.ring.release(slot)
+                return {"id": fid, "ok": False, "error": "write_failed"}
+            try:
+                return await asyncio.wait_for(self._reply(fut), timeout=timeout)
+            except asyncio.TimeoutError:
+                return {"id": fid, "ok": False, "error": "timeout"}
+            except ConnectionError:
+                # 파이프가 끊겼다. 슬롯과 outstanding 은 리더가 EOF 에서 정리한다.
+                return {"id": fid, "ok": False, "error": "write_failed"}
+        finally:
+            # 타임아웃/취소 어느 쪽이든 pending 에서 빼서 늦게 온 응답이 쌓이지 않게 한다.
+            self.pending.pop(fid, None)
 
     def is_alive(self) -> bool:
-        return self.proc.poll() is None
+        return self.proc.returncode is None and not self._reader.done()
+
+    def observe(self, latency: float, alpha: float = 0.2):
+        self.ewma = latency if self.ewma == 0.0 else (1 - alpha) * self.ewma + alpha * latency
 
-    def stop(self):
-        self._stop.set()
+    async def stop(self, kill: bool = False, timeout: float = STOP_TIMEOUT):
+        # 프로세스가 끝날 때까지 기다려 좀비를 남기지 않고, 리더 태스크도 정리한 뒤 돌아온다.
+        # 종료 후 stdout EOF 를 읽은 리더가 남은 요청을 worker_exited 로 끝낸다.
         try:
-            if self.is_alive():
-                self.proc.terminate()
-        except Exception:
+            if self.proc.returncode is None:
+                self.proc.kill() if kill else self.proc.terminate()
+        except ProcessLookupError:
             pass
+        try:
+            await asyncio.wait_for(self.proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[worker {self.name}] {timeout:.0f}초 안에 종료되지 않아 kill 합니다.")
+            try:
+                self.proc.kill()
+            except ProcessLookupError:
+                pass
+            await self.proc.wait()
+        self.proc.stdin.close()
+        tasks = (self._reader, self._stderr)
+        _, running = await asyncio.wait(tasks, timeout=1.0)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.ring is not None:
+            self.ring.close()
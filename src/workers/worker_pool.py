@@ -1,31 +1,394 @@
 
 import os
 import sys
-import threading
-from typing import List
+import time
+import asyncio
+import logging
+import bisect
+import random
+import hashlib
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from prometheus_client import Counter, Gauge, Histogram
 from worker_manager import PopenWorker
+from protocol import DEFAULT_FORMAT
+
+# 워커당 공유 메모리 슬롯 수/크기. 슬롯 수 0 이면 기존 base64 JSON 전송만 쓴다.
+SHM_SLOTS = int(os.environ.get("WORKER_SHM_SLOTS", "4"))
+SHM_SLOT_SIZE = int(os.environ.get("WORKER_SHM_SLOT_SIZE", str(1 << 20)))
+# 워커 하나에 동시에 보낼 수 있는 요청 수. 모든 워커가 가득 차면 바로 overloaded 를 돌려준다.
+MAX_INFLIGHT = int(os.environ.get("WORKER_MAX_INFLIGHT", "4"))
+POLICY = os.environ.get("WORKER_POOL_POLICY", "least_outstanding")
+# 헬스 체크: 주기마다 ping 하고 연속 실패 횟수가 넘으면 멈춘 워커로 보고 교체한다.
+HEALTH_INTERVAL = float(os.environ.get("WORKER_HEALTH_INTERVAL_SEC", "2.0"))
+PING_TIMEOUT = float(os.environ.get("WORKER_PING_TIMEOUT_SEC", "2.0"))
+PING_FAILURES = int(os.environ.get("WORKER_PING_FAILURES", "2"))
+# 모델을 미리 올려 둔 예비 워커 수. 교체 시 콜드 스타트 없이 바로 투입한다.
+SPARES = int(os.environ.get("WORKER_SPARES", "1"))
+WARMUP_TIMEOUT = 30.0
+RESPAWN_BACKOFF_MAX = 30.0
+
+logger = logging.getLogger('prod')
+
+POLICIES = ("least_outstanding", "p2c", "ewma", "round_robin")
+# 일관된 해시 링에서 워커 하나가 차지하는 가상 노드 수
+RING_REPLICAS = 64
+
+ASK_SECONDS = Histogram(
+    "worker_ask_seconds", "워커 요청 왕복 시간", ["worker"],
+    buckets=(0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0),
+)
+ASK_RESULTS = Counter("worker_ask_total", "워커 요청 결과", ["worker", "result"])
+OUTSTANDING = Gauge("worker_pool_outstanding", "풀 전체에서 워커 응답을 기다리는 요청 수")
+REJECTED = Counter("worker_pool_rejected_total", "가용 워커가 없어 거절한 요청 수")
+LIVE_WORKERS = Gauge("worker_pool_live_workers", "살아있는 워커 수")
+REBINDS = Counter("worker_pool_rebinds_total", "세션이 다른 워커로 옮겨간 횟수", ["reason"])
+SESSIONS = Gauge("worker_pool_sessions", "워커에 묶여 있는 세션 수")
+HEALTH_FAILURES = Counter("worker_pool_ping_failures_total", "응답하지 않은 헬스 체크 ping 수")
+RESPAWNS = Counter("worker_pool_respawns_total", "교체된 워커 수", ["reason", "source"])
+SPARE_WORKERS = Gauge("worker_pool_spares", "준비된 예비 워커 수")
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
 
 
 class WorkerPool:
-    def __init__(self, n: int):
-        cmd = [sys.executable, "worker.py"]
-        env = dict(os.environ)
-        env.setdefault("OMP_NUM_THREADS", "1")
-        env.setdefault("MKL_NUM_THREADS", "1")
-        self.workers: List[PopenWorker] = [
-            PopenWorker(cmd, env=env) for _ in range(n)]
+    def __init__(
+        self,
+        n: int,
+        shm_slots: int = SHM_SLOTS,
+        shm_slot_size: int = SHM_SLOT_SIZE,
+        max_inflight: int = MAX_INFLIGHT,
+        policy: str = POLICY,
+        spares: int = SPARES,
+        health_interval: float = HEALTH_INTERVAL,
+        ping_timeout: float = PING_TIMEOUT,
+        ping_failures: int = PING_FAILURES
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"지원하지 않는 스케줄링 정책입니다: {policy}")
+        self._cmd = [sys.executable, "worker.py"]
+        self._env = dict(os.environ)
+        self._env.setdefault("OMP_NUM_THREADS", "1")
+        self._env.setdefault("MKL_NUM_THREADS", "1")
+        self._shm_slots = shm_slots
+        self._shm_slot_size = shm_slot_size
+        self.size = n
+        self.workers: List[PopenWorker] = []
+        self.max_inflight = max_inflight
+        self.policy = policy
         self._idx = 0
-        self._lock = threading.Lock()
-
-    def pick(self) -> PopenWorker:
-        with self._lock:
-            for _ in range(len(self.workers)):
-                w = self.workers[self._idx % len(self.workers)]
-                self._idx += 1
-                if w.is_alive():
-                    return w
-            return self.workers[0]
-
-    def shutdown(self):
-        for w in self.workers:
-            w.stop()
+        # 세션 id -> 워커. MediaPipe 추적 상태를 살리려고 한 세션의 프레임은 같은 워커로 보낸다.
+        self.bindings: Dict[str, PopenWorker] = {}
+        # 새로 묶였거나 다른 워커로 옮겨져 아직 첫 프레임을 보내지 않은 세션. 첫 프레임에 추적 리셋을 붙인다.
+        self._rebound: Set[str] = set()
+        self._ring: List[Tuple[int, PopenWorker]] = []
+        self._ring_keys: List[int] = []
+        self._rebuild_ring()
+
+        self.spare_count = spares
+        self.spares: List[PopenWorker] = []
+        self._warming: Set[PopenWorker] = set()
+        self._warm_tasks: Set[asyncio.Task] = set()
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.ping_failures = ping_failures
+        self._failures: Dict[str, int] = {}
+        self._spawned = 0
+        self._backoff = 0.0
+        self._next_spawn = 0.0
+        self._supervisor: Optional[asyncio.Task] = None
+        # 최근 요청의 (시각, 지연, 타임아웃 여부). 오토스케일러가 p95/타임아웃 비율을 계산한다.
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=10000)
+        self._draining: Set[PopenWorker] = set()
+        OUTSTANDING.set_function(self.outstanding)
+        SESSIONS.set_function(lambda: len(self.bindings))
+        SPARE_WORKERS.set_function(lambda: len(self.spares))
+
+    async def _spawn(self, name: str) -> PopenWorker:
+        return await PopenWorker.spawn(self._cmd, env=self._env, shm_slots=self._shm_slots,
+                                       shm_slot_size=self._shm_slot_size, name=name)
+
+    def _rebuild_ring(self):
+        self._ring = sorted(
+            ((_hash(f"{w.name}#{i}"), w) for w in self.workers for i in range(RING_REPLICAS)),
+            key=lambda t: t[0])
+        self._ring_keys = [h for h, _ in self._ring]
+
+    def _ring_order(self, session_id: str) -> List[PopenWorker]:
+        # 세션 해시 위치부터 시계 방향으로 만나는 워커 순서 (중복 제거)
+        if not self._ring:
+            return []
+        start = bisect.bisect(self._ring_keys, _hash(session_id))
+        order: List[PopenWorker] = []
+        for i in range(len(self._ring)):
+            w = self._ring[(start + i) % len(self._ring)][1]
+            if w not in order:
+                order.append(w)
+                if len(order) == len(self.workers):
+                    break
+        return order
+
+    def _has_capacity(self, w: PopenWorker) -> bool:
+        return w.is_alive() and len(w.outstanding) < self.max_inflight
+
+    def available(self) -> List[PopenWorker]:
+        return [w for w in self.workers if self._has_capacity(w)]
+
+    def pick(self, session_id: Optional[str] = None) -> Optional[PopenWorker]:
+        # 여유 있는 워커가 없으면 None. 죽은 워커나 가득 찬 워커에는 보내지 않는다.
+        if session_id is not None:
+            return self._pick_sticky(session_id)
+        candidates = self.available()
+        LIVE_WORKERS.set(sum(1 for w in self.workers if w.is_alive()))
+        if not candidates:
+            return None
+        if self.policy == "least_outstanding":
+            return min(candidates, key=lambda w: (len(w.outstanding), w.ewma))
+        if self.policy == "p2c":
+            if len(candidates) == 1:
+                return candidates[0]
+            a, b = random.sample(candidates, 2)
+            return a if (len(a.outstanding), a.ewma) <= (len(b.outstanding), b.ewma) else b
+        if self.policy == "ewma":
+            # 예상 대기 시간 = 평균 지연 x (밀린 요청 + 1)
+            return min(candidates, key=lambda w: w.ewma * (len(w.outstanding) + 1))
+        w = candidates[self._idx % len(candidates)]
+        self._idx += 1
+        return w
+
+    def _pick_sticky(self, session_id: str) -> Optional[PopenWorker]:
+        bound = self.bindings.get(session_id)
+        if bound is not None:
+            if self._has_capacity(bound):
+                return bound
+            # 워커가 죽었거나 가득 찼을 때만 링의 다음 워커로 옮긴다.
+            REBINDS.labels("dead" if not bound.is_alive() else "overloaded").inc()
+        for w in self._ring_order(session_id):
+            if self._has_capacity(w):
+                if w is not bound:
+                    self.bindings[session_id] = w
+                    self._rebound.add(session_id)
+                return w
+        return None
+
+    def release(self, session_id: str):
+        self.bindings.pop(session_id, None)
+        self._rebound.discard(session_id)
+
+    async def ask(
+        self,
+        frame: bytes,
+        expect_gray: bool,
+        timeout: float = 0.5,
+        fmt: str = DEFAULT_FORMAT,
+        session_id: Optional[str] = None
+    ) -> dict:
+        worker = self.pick(session_id)
+        if worker is None:
+            REJECTED.inc()
+            return {"ok": False, "error": "overloaded"}
+
+        # 워커는 세션마다 추적 그래프를 따로 두므로, 세션이 이 워커에 새로 묶였을 때만 리셋한다.
+        reset = session_id in self._rebound
+        self._rebound.discard(session_id)
+        started = time.perf_counter()
+        res = await worker.ask(frame, expect_gray, timeout=timeout, fmt=fmt,
+                               reset=reset, sid=session_id)
+        latency = time.perf_counter() - started
+        # 타임아웃도 지연으로 반영해 느린 워커의 점수를 올린다.
+        worker.observe(latency)
+        ASK_SECONDS.labels(worker.name).observe(latency)
+        result = ("cached" if res.get("cached") else "ok") if res.get("ok") else res.get("error", "error")
+        ASK_RESULTS.labels(worker.name, result).inc()
+        self._samples.append((time.monotonic(), latency, res.get("error") == "timeout"))
+        return res
+
+    def recent(self, window: float) -> Tuple[List[float], int]:
+        # 최근 window 초 동안의 요청 지연 목록과 타임아웃 수
+        since = time.monotonic() - window
+        latencies: List[float] = []
+        timeouts = 0
+        for ts, latency, timed_out in reversed(self._samples):
+            if ts < since:
+                break
+            latencies.append(latency)
+            timeouts += timed_out
+        return latencies, timeouts
+
+    async def add_worker(self) -> Optional[PopenWorker]:
+        # 예비 워커가 있으면 바로 투입하고, 없으면 새로 띄워 모델 로드가 끝난 뒤 투입한다.
+        names = {w.name for w in self.workers}
+        name = str(next(i for i in range(len(names) + 1) if str(i) not in names))
+        w = None
+        while self.spares and w is None:
+            spare = self.spares.pop()
+            if spare.is_alive():
+                w = spare
+            else:
+                await spare.stop()
+        if w is None:
+            w = await self._try_spawn(name)
+            if w is None or not await w.ping(WARMUP_TIMEOUT):
+                if w is not None:
+                    await w.stop(kill=True)
+                    self._fail_spawn()
+                return None
+        w.name = name
+        self.workers.append(w)
+        self._rebuild_ring()
+        return w
+
+    async def drain_worker(self, timeout: float = 5.0) -> Optional[str]:
+        # 새 요청을 받지 않게 빼낸 뒤 보낸 요청이 모두 끝나면 종료한다.
+        if len(self.workers) <= 1:
+            return None
+        bound: Dict[PopenWorker, int] = {}
+        for w in self.bindings.values():
+            bound[w] = bound.get(w, 0) + 1
+        victim = min(self.workers, key=lambda w: (bound.get(w, 0), len(w.outstanding)))
+        self.workers.remove(victim)
+        self._rebuild_ring()
+        # 묶여 있던 세션은 다음 프레임에서 링의 다른 워커로 옮겨가며 추적을 리셋한다.
+        for sid in [sid for sid, w in self.bindings.items() if w is victim]:
+            del self.bindings[sid]
+        self._draining.add(victim)
+        deadline = time.monotonic() + timeout
+        while victim.outstanding and victim.is_alive() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await victim.stop()
+        self._draining.discard(victim)
+        return victim.name
+
+    def outstanding(self) -> int:
+        return sum(len(w.outstanding) for w in self.workers)
+
+    def utilization(self) -> float:
+        # 풀 전체 inflight 한도 대비 대기 요청 비율
+        return self.outstanding() / max(1, len(self.workers) * self.max_inflight)
+
+    async def start(self):
+        # 워커를 띄우고 감시 태스크를 시작한다. 이벤트 루프 안에서 불러야 한다.
+        if not self.workers:
+            self.workers = list(await asyncio.gather(
+                *(self._spawn(str(i)) for i in range(self.size))))
+            self._rebuild_ring()
+            # 모델 로드가 끝날 때까지 기다려 첫 프레임이 콜드 스타트로 타임아웃되지 않게 한다.
+            await asyncio.gather(*(w.ping(WARMUP_TIMEOUT) for w in self.workers))
+        if self._supervisor is None:
+            self._supervisor = asyncio.create_task(self._supervise())
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("워커 감시 루프 오류")
+
+    async def check(self):
+        alive = [w for w in self.workers if w.is_alive()]
+        pongs = await asyncio.gather(*(w.ping(self.ping_timeout) for w in alive))
+        healthy = {w for w, ok in zip(alive, pongs) if ok}
+
+        for w in list(self.workers):
+            if not w.is_alive():
+                logger.warning(f"워커 {w.name} 종료 감지 (exit={w.proc.returncode}), 교체합니다.")
+                await self._replace(w, "dead")
+            elif w in healthy:
+                self._failures[w.name] = 0
+            elif not w.ready and time.monotonic() - w.started_at < WARMUP_TIMEOUT:
+                # 아직 모델을 올리는 중인 워커는 멈춘 것으로 보지 않는다.
+                continue
+            else:
+                HEALTH_FAILURES.inc()
+                self._failures[w.name] = self._failures.get(w.name, 0) + 1
+                if self._failures[w.name] >= self.ping_failures:
+                    logger.warning(f"워커 {w.name} 가 ping 에 {self._failures[w.name]}회 응답하지 않아 교체합니다.")
+                    await w.stop(kill=True)
+                    await self._replace(w, "hung")
+        await self._fill_spares()
+
+    async def _replace(self, old: PopenWorker, reason: str):
+        # 준비된 예비 워커가 있으면 그것을, 없으면 새 프로세스를 띄운다 (백오프 중이면 다음 주기로 미룬다).
+        if old not in self.workers:
+            # 그 사이 오토스케일러가 빼낸 워커
+            return
+        spare = None
+        while self.spares and spare is None:
+            w = self.spares.pop()
+            if w.is_alive():
+                spare = w
+            else:
+                await w.stop()
+        source = "spare"
+        if spare is None:
+            spare = await self._try_spawn(old.name)
+            source = "cold"
+        if spare is None:
+            return
+        if old not in self.workers:
+            await spare.stop()
+            return
+        spare.name = old.name
+        self.workers[self.workers.index(old)] = spare
+        self._failures[old.name] = 0
+        self._rebuild_ring()
+        await old.stop()
+        RESPAWNS.labels(reason, source).inc()
+
+    async def _try_spawn(self, name: str) -> Optional[PopenWorker]:
+        if time.monotonic() < self._next_spawn:
+            return None
+        try:
+            return await self._spawn(name)
+        except Exception:
+            logger.exception("워커 프로세스 생성 실패")
+            self._fail_spawn()
+            return None
+
+    def _fail_spawn(self):
+        self._backoff = min(RESPAWN_BACKOFF_MAX, max(1.0, self._backoff * 2))
+        self._next_spawn = time.monotonic() + self._backoff
+
+    async def _fill_spares(self):
+        for w in [w for w in self.spares if not w.is_alive()]:
+            self.spares.remove(w)
+            await w.stop()
+        while len(self.spares) + len(self._warming) < self.spare_count:
+            self._spawned += 1
+            w = await self._try_spawn(f"spare-{self._spawned}")
+            if w is None:
+                return
+            self._warming.add(w)
+            task = asyncio.create_task(self._warm(w))
+            self._warm_tasks.add(task)
+            task.add_done_callback(self._warm_tasks.discard)
+
+    async def _warm(self, w: PopenWorker):
+        # 첫 pong 은 MediaPipe 모델 로드가 끝난 뒤에 오므로 이걸로 준비 완료를 판단한다.
+        try:
+            ok = await w.ping(WARMUP_TIMEOUT)
+        finally:
+            self._warming.discard(w)
+        if ok and self._supervisor is not None:
+            self._backoff = 0.0
+            self.spares.append(w)
+        else:
+            await w.stop(kill=True)
+            if not ok:
+                self._fail_spawn()
+                logger.warning(f"예비 워커 {w.name} 준비 실패, {self._backoff:.0f}초 뒤 재시도")
+
+    async def shutdown(self):
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+            self._supervisor = None
+        # 준비 중인 예비 워커는 _warm 이 취소되면서 _warming 에서 빠지므로 목록을 먼저 잡아 둔다.
+        workers = self.workers + self.spares + list(self._warming) + list(self._draining)
+        for task in list(self._warm_tasks):
+            task.cancel()
+        await asyncio.gather(*self._warm_tasks, return_exceptions=True)
+        await asyncio.gather(*(w.stop() for w in workers))
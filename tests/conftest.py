@@ -0,0 +1,8 @@
+import os
+
+# src.config 는 import 시점에 필수 환경변수를 요구한다. 테스트용 기본값을 채워 둔다.
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_USER_ID_CLAIM", "sub")
+os.environ.setdefault("JWT_JTI_CLAIM", "jti")
+for _key in ("SECRET_KEY", "JWT_AUDIENCE", "JWT_ISSUER", "DATABASE_URL"):
+    os.environ.setdefault(_key, "test")
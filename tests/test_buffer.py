@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo.errors import BulkWriteError
+
+from src.database.buffer import AngleLogBuffer
+
+
+class FakeRepo:
+    def __init__(self, fail_index=None, delay=0.0):
+        self.calls = []
+        self.fail_index = fail_index
+        self.delay = delay
+
+    async def insert_many(self, documents):
+        await asyncio.sleep(self.delay)
+        self.calls.append(list(documents))
+        if self.fail_index is not None and self.fail_index < len(documents):
+            index, self.fail_index = self.fail_index, None
+            raise BulkWriteError({"writeErrors": [{"index": index, "code": 11000}]})
+
+
+class FakeRollupRepo:
+    def __init__(self):
+        self.ops = []
+
+    async def bulk_write(self, ops):
+        self.ops.extend(ops)
+
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _samples(rollups):
+    return sum(op._doc["$inc"]["samples"] for op in rollups.ops if op._filter["granularity"] == "minute")
+
+
+def test_flush_writes_in_max_batch_chunks():
+    async def scenario():
+        repo, rollups = FakeRepo(), FakeRollupRepo()
+        buf = AngleLogBuffer(repo, rollup_repo=rollups, max_batch=4, flush_interval=60)
+        await buf.add(1, [{"angle": 10.0, "logged_at": NOW} for _ in range(6)])
+        await buf.add(2, [{"angle": 20.0, "logged_at": NOW} for _ in range(5)])
+        await buf.flush()
+        assert [len(c) for c in repo.calls] == [4, 4, 3]
+        assert _samples(rollups) == 11
+        assert buf._count == 0
+
+    asyncio.run(scenario())
+
+
+def test_rollups_skip_documents_that_failed_to_insert():
+    async def scenario():
+        repo, rollups = FakeRepo(fail_index=1), FakeRollupRepo()
+        buf = AngleLogBuffer(repo, rollup_repo=rollups, max_batch=100, flush_interval=60)
+        await buf.add(1, [{"angle": float(a), "logged_at": NOW} for a in (10, 20, 30)])
+        await buf.flush()
+        assert _samples(rollups) == 2
+        assert buf._count == 0
+
+    asyncio.run(scenario())
+
+
+def test_stop_finishes_in_flight_flush():
+    async def scenario():
+        repo = FakeRepo(delay=0.2)
+        buf = AngleLogBuffer(repo, max_batch=1, flush_interval=0.05)
+        await buf.start()
+        await buf.add(1, [{"angle": 1.0}] * 5)
+        await asyncio.sleep(0.1)
+        await buf.add(1, [{"angle": 1.0}] * 3)
+        await buf.stop()
+        assert sum(len(c) for c in repo.calls) == 8
+        assert buf._count == 0
+
+    asyncio.run(scenario())
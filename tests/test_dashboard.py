@@ -0,0 +1,35 @@
+import asyncio
+from datetime import datetime, timezone
+
+from src.routers import users as users_router
+from src.schemas.jwt import TokenData
+
+
+class FakeUserDb:
+    async def get_by_user_id(self, user_id):
+        return {"user_id": user_id}
+
+
+class FakeAngleDb:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def find_time_range(self, filter_, **kwargs):
+        return list(self.docs)
+
+
+def test_settings_accepts_migrated_logs_without_shoulder_fields(monkeypatch):
+    # migrate_embedded_angles 는 없는 어깨 값을 None 으로 옮기고, 시계열 문서는 필드가 아예 없을 수 있다.
+    docs = [
+        {"angle": 12.5, "shoulder_y_diff": None, "shoulder_y_avg": None, "breach": False,
+         "logged_at": datetime(2026, 1, 1, 0, 0, 2, tzinfo=timezone.utc)},
+        {"angle": 10.0, "logged_at": datetime(2026, 1, 1, 0, 0, 1, tzinfo=timezone.utc)},
+    ]
+    monkeypatch.setattr(users_router, "user_db", FakeUserDb())
+    monkeypatch.setattr(users_router, "angle_db", FakeAngleDb(docs))
+
+    res = asyncio.run(users_router.get_my_settings(TokenData(user_id=7)))
+
+    logs = res["settings"]["angles_logs"]
+    assert [log["angle"] for log in logs] == [10.0, 12.5]
+    assert logs[1]["shoulder_y_diff"] is None and logs[0]["shoulder_y_avg"] is None
@@ -0,0 +1,102 @@
+import asyncio
+import base64
+import json
+
+from src.connection import protocol, session as session_module
+from src.connection.session import TextneckSession
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.sent: asyncio.Queue = asyncio.Queue()
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    async def send_json(self, data):
+        await self.sent.put(("text", json.dumps(data)))
+
+    async def send_text(self, data):
+        await self.sent.put(("text", data))
+
+    async def send_bytes(self, data):
+        await self.sent.put(("bytes", data))
+
+    async def close(self):
+        pass
+
+
+class EchoExecutor:
+    # CoreService 처럼 바이너리 프레임엔 bytes, base64 프레임엔 str 오버레이를 돌려준다.
+    async def prepare(self, session_id):
+        pass
+
+    async def run(self, session_id, frame, output):
+        return {"has_angle": False, "img": frame}
+
+    def utilization(self):
+        return 0.0
+
+    def release(self, session_id):
+        pass
+
+
+def test_mixed_binary_then_text_frames(monkeypatch):
+    monkeypatch.setattr(session_module, "inference_executor", EchoExecutor())
+
+    async def scenario():
+        ws = FakeWebSocket()
+        sess = TextneckSession(ws, user_id=1)
+        task = asyncio.create_task(sess.run())
+
+        await ws.inbox.put({"type": "websocket.receive", "bytes": b"\xff\xd8jpeg"})
+        kind, payload = await asyncio.wait_for(ws.sent.get(), 2)
+        assert kind == "bytes"
+        magic, _, length = protocol.RESULT_HEADER.unpack_from(payload)
+        assert magic == protocol.RESULT_MAGIC
+        assert payload[protocol.RESULT_HEADER.size + length:] == b"\xff\xd8jpeg"
+
+        legacy = base64.b64encode(b"\xff\xd8legacy").decode("ascii")
+        await ws.inbox.put({"type": "websocket.receive", "text": legacy})
+        kind, payload = await asyncio.wait_for(ws.sent.get(), 2)
+        assert kind == "text"
+        assert json.loads(payload)["img"] == legacy
+
+        assert not task.done()
+        await ws.inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(task, return_exceptions=True)
+        assert sess.stats["processed"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_encode_result_ignores_base64_image():
+    assert protocol.encode_result({"img": "aGVsbG8="}) is None
+    assert protocol.encode_result({"img": b"jpeg"}).endswith(b"jpeg")
+
+
+def test_rate_control_only_for_clients_that_opt_in(monkeypatch):
+    monkeypatch.setattr(session_module, "inference_executor", EchoExecutor())
+
+    async def scenario():
+        ws = FakeWebSocket()
+        sess = TextneckSession(ws, user_id=1)
+
+        await sess.handle_control({"action": "init"})
+        _, reply = ws.sent.get_nowait()
+        assert "fps" not in json.loads(reply)
+        assert sess.flow is None
+
+        # 속도 제어를 모르는 클라이언트의 프레임은 몇 개가 몰려와도 throttle 하지 않는다.
+        sess.paused = False
+        for _ in range(20):
+            sess.offer(b"frame")
+        assert sess.stats["dropped_throttled"] == 0
+
+        await sess.handle_control({"action": "init", "rate": True})
+        _, reply = ws.sent.get_nowait()
+        assert json.loads(reply)["fps"] >= 1
+        assert sess.flow is not None
+
+    asyncio.run(scenario())